@@ -0,0 +1,258 @@
+"""
+Adaptive (one-pass) Huffman coding, with the FGK algorithm (Faller, Gallager, Knuth).
+
+Instead of counting the whole message first, the encoder and decoder both start from a tree holding only the
+"not yet transmitted" (NYT) leaf, and update the tree the same way after every symbol. A symbol seen before is sent
+as its current code; a new symbol is sent as the NYT code followed by the symbol itself as a fixed-width literal.
+Since the decoder rebuilds the same tree from the symbols it has decoded, no header is needed, and each symbol's bits
+can be sent as soon as it arrives.
+"""
+from TreeNodesFile import *
+from BitStreamFile import BitWriter
+from typing import Any, Dict, Iterable, List, Tuple
+
+TEXT_LITERAL_BITS = 21  # enough for any unicode code point
+BYTE_LITERAL_BITS = 8
+
+
+class AdaptiveNode(TreeNode[T]):
+    """
+    A TreeNode that also knows its weight (how many times its symbols have been seen), its parent, and its position
+    in AdaptiveHuffmanTree.order.
+    """
+    def __init__(self, value:T=None, parent:"AdaptiveNode[T]"=None, weight:int=0):
+        super().__init__(value=value, left=None, right=None)
+        self.parent = parent
+        self.weight = weight
+        self.position = 0
+
+    def is_leaf(self) -> bool:
+        return self.left is None
+
+
+class AdaptiveHuffmanTree():
+    """
+    The model shared by the encoder and decoder. order lists every node so that weights never increase along it,
+    and every node comes before its children (the "sibling property"); the FGK update keeps it that way by swapping
+    a node with the first node of equal weight (its block's leader) before adding one to its weight.
+    leaders maps each weight to the position of its leader, so that finding one takes O(1) instead of a scan back
+    through a block that can be as big as the alphabet.
+    """
+    def __init__(self):
+        self.nyt:AdaptiveNode = AdaptiveNode()
+        self.root:AdaptiveNode = self.nyt
+        self.order:List[AdaptiveNode] = [self.root]
+        self.leaves:Dict[Any, AdaptiveNode] = {}
+        self.leaders:Dict[int, int] = {0: 0}
+
+    def code_of(self, node:AdaptiveNode) -> Tuple[int, int]:
+        """
+        gives the current path to node as (code, code_length).
+        """
+        code = 0
+        length = 0
+        while node.parent is not None:
+            if node.parent.right is node:
+                code |= 1 << length
+            length += 1
+            node = node.parent
+        return code, length
+
+    def add_symbol(self, symbol:Any) -> AdaptiveNode:
+        """
+        splits the NYT leaf into a joint node whose children are a new NYT leaf (left) and a leaf for symbol (right).
+        :return: the new leaf, with weight 0.
+        """
+        joint = self.nyt
+        leaf = AdaptiveNode(symbol, joint)
+        new_nyt = AdaptiveNode(None, joint)
+        joint.left = new_nyt
+        joint.right = leaf
+        leaf.position = len(self.order)
+        self.order.append(leaf)
+        new_nyt.position = len(self.order)
+        self.order.append(new_nyt)
+        self.nyt = new_nyt
+        self.leaves[symbol] = leaf
+        return leaf
+
+    def update(self, symbol:Any):
+        """
+        counts one more occurrence of symbol (adding it if it is new), moving nodes so the tree stays a Huffman tree.
+        """
+        node = self.leaves.get(symbol)
+        if node is None:
+            node = self.add_symbol(symbol)
+        order = self.order
+        leaders = self.leaders
+        while node is not None:
+            weight = node.weight
+            leader = order[leaders[weight]]
+            if leader is not node and leader is not node.parent:
+                self.swap(node, leader)
+            node.weight += 1
+            position = node.position
+            if leaders[weight] == position:
+                # the block of the old weight now starts after this node, if anything is left in it. The one node
+                # that can be out of order here is a child that was just moved up a weight while its parent (this
+                # node) was its leader, so skip past it.
+                after = position + 1
+                while after < len(order) and order[after].weight > weight:
+                    after += 1
+                if after < len(order) and order[after].weight == weight:
+                    leaders[weight] = after
+                else:
+                    del leaders[weight]
+            if leaders.get(weight + 1, len(order)) > position:
+                leaders[weight + 1] = position
+            node = node.parent
+
+    def swap(self, a:AdaptiveNode, b:AdaptiveNode):
+        """
+        exchanges two subtrees (neither an ancestor of the other) in the tree and in order.
+        """
+        a_parent = a.parent
+        b_parent = b.parent
+        if a_parent is b_parent:
+            a_parent.left, a_parent.right = a_parent.right, a_parent.left
+        else:
+            if a_parent.left is a:
+                a_parent.left = b
+            else:
+                a_parent.right = b
+            if b_parent.left is b:
+                b_parent.left = a
+            else:
+                b_parent.right = a
+            a.parent = b_parent
+            b.parent = a_parent
+        self.order[a.position] = b
+        self.order[b.position] = a
+        a.position, b.position = b.position, a.position
+
+
+class AdaptiveHuffmanEncoder():
+    """
+    Encodes an unbounded stream of symbols in one pass. Feed it with encode_chunk(); it returns the bytes that are
+    complete so far, so they can be sent straight away. At the end, flush() gives the last, partly filled byte.
+    :param text: True if the symbols are single-character strings, False if they are ints (e.g. bytes).
+    :param literal_bits: how many bits a new symbol is sent with; defaults to enough for a code point or a byte.
+    """
+    def __init__(self, text:bool=True, literal_bits:int=None):
+        self.text = text
+        self.literal_bits = literal_bits or (TEXT_LITERAL_BITS if text else BYTE_LITERAL_BITS)
+        self.tree = AdaptiveHuffmanTree()
+        self.writer = BitWriter()
+        self.symbol_count = 0
+
+    def encode_symbol(self, symbol:Any):
+        tree = self.tree
+        node = tree.leaves.get(symbol)
+        if node is None:
+            self.writer.write(*tree.code_of(tree.nyt))
+            literal = ord(symbol) if self.text else symbol
+            if literal < 0 or literal >> self.literal_bits:
+                raise ValueError(f"The symbol {symbol!r} does not fit in {self.literal_bits} bits.")
+            self.writer.write(literal, self.literal_bits)
+        else:
+            self.writer.write(*tree.code_of(node))
+        tree.update(symbol)
+        self.symbol_count += 1
+
+    def encode_chunk(self, symbols:Iterable[Any]) -> bytes:
+        """
+        encodes the symbols and gives back every whole byte written since the last call.
+        """
+        for symbol in symbols:
+            self.encode_symbol(symbol)
+        self.writer.flush_whole_bytes()
+        result = bytes(self.writer.buffer)
+        self.writer.buffer.clear()
+        return result
+
+    def flush(self) -> Tuple[bytes, int]:
+        """
+        ends the stream.
+        :return: (the remaining bytes, the number of bits in them that are not padding)
+        """
+        tail_bits = self.writer.pending
+        result = bytes(self.writer.getvalue())
+        self.writer.buffer.clear()
+        return result, tail_bits
+
+    def encode(self, symbols:Iterable[Any]) -> Tuple[bytes, int]:
+        """
+        encodes a whole message at once.
+        :return: (the packed bits, the number of bits)
+        """
+        data = self.encode_chunk(symbols)
+        tail, tail_bits = self.flush()
+        return data + tail, 8 * len(data) + tail_bits
+
+
+class AdaptiveHuffmanDecoder():
+    """
+    Mirrors AdaptiveHuffmanEncoder: feed() it bytes as they arrive, and it gives back the symbols they complete.
+    A code that is cut off at the end of one feed is picked up again at the start of the next.
+    :param text: and literal_bits: must match the encoder's.
+    """
+    def __init__(self, text:bool=True, literal_bits:int=None):
+        self.text = text
+        self.literal_bits = literal_bits or (TEXT_LITERAL_BITS if text else BYTE_LITERAL_BITS)
+        self.tree = AdaptiveHuffmanTree()
+        self.current:AdaptiveNode = self.tree.root
+        self.literal_remaining = 0  # bits still to read of a new symbol's literal
+        self.literal = 0
+        self.start_symbol()
+
+    def start_symbol(self):
+        self.current = self.tree.root
+        if self.current is self.tree.nyt:
+            self.literal_remaining = self.literal_bits
+            self.literal = 0
+
+    def finish_symbol(self, symbol:Any, output:List[Any]):
+        output.append(symbol)
+        self.tree.update(symbol)
+        self.start_symbol()
+
+    def feed(self, data, bit_length:int=None) -> List[Any]:
+        """
+        decodes as much as possible of the given bits.
+        :param data: bytes or any other buffer-protocol object.
+        :param bit_length: how many bits of data to use (for the last, padded piece of a stream); defaults to all.
+        :return: the symbols completed by these bits.
+        """
+        data = memoryview(data).cast("B")
+        if bit_length is None:
+            bit_length = 8 * len(data)
+        output:List[Any] = []
+        for index in range(bit_length):
+            bit = (data[index >> 3] >> (7 - (index & 7))) & 1
+            if self.literal_remaining > 0:
+                self.literal = (self.literal << 1) | bit
+                self.literal_remaining -= 1
+                if self.literal_remaining == 0:
+                    self.finish_symbol(chr(self.literal) if self.text else self.literal, output)
+                continue
+            node = self.current.right if bit else self.current.left
+            if node.is_leaf():
+                if node is self.tree.nyt:
+                    self.current = node
+                    self.literal_remaining = self.literal_bits
+                    self.literal = 0
+                else:
+                    self.finish_symbol(node.value, output)
+            else:
+                self.current = node
+        return output
+
+    def decode(self, data, bit_length:int) -> List[Any]:
+        """
+        decodes a whole message made by AdaptiveHuffmanEncoder.encode.
+        """
+        output = self.feed(data, bit_length)
+        if self.literal_remaining != (self.literal_bits if self.current is self.tree.nyt else 0) \
+                or self.current is not self.tree.root:
+            raise ValueError("The encoded message ends in the middle of a symbol.")
+        return output
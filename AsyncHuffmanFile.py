@@ -0,0 +1,233 @@
+"""
+asyncio versions of the HuffmanStreamFile codec, for compressing inside an event loop.
+
+The stream format is the same as HuffmanStreamFile's, so either side can be synchronous. Since a compressed stream
+starts with its code, the encoder has to be chosen before the first chunk is sent: pass one built from known counts
+(e.g. HuffmanStreamFile.build_stream_encoder), or use byte_encoder(), which can encode any byte. Each chunk is encoded
+or decoded on its own, with a yield to the event loop in between; chunks of at least offload_size bytes are handed
+to an executor instead, so a large payload never blocks the loop for long. Output is produced only as fast as the
+consumer takes it, and the StreamWriter functions wait on drain() after every chunk.
+
+    python -m AsyncHuffmanFile
+
+runs an example: an echo server on a loopback port that decompresses what it receives and sends it back compressed,
+and a client that checks it gets back what it sent.
+"""
+import asyncio
+import random
+from collections import Counter
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Dict, Union
+
+from HuffmanEncoderFile import HuffmanEncoder
+from HuffmanStreamFile import MAGIC, build_stream_encoder, encode_record, decode_record
+from CanonicalCodeFile import parse_code_lengths, write_varint
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+DEFAULT_OFFLOAD_SIZE = 1 << 18
+
+ByteSource = Union[asyncio.StreamReader, AsyncIterable[bytes]]
+
+
+def byte_encoder(sample:bytes=b"") -> HuffmanEncoder:
+    """
+    makes a canonical encoder shaped by the byte counts of sample, that can still encode every byte value (each
+    value is counted once more than it appears in sample).
+    """
+    counts:Counter = Counter(sample)
+    for value in range(256):
+        counts[value] += 1
+    return build_stream_encoder(dict(counts))
+
+
+async def _run(function, *args, size:int, executor:Executor, offload_size:int):
+    """
+    calls function(*args) in executor if size is at least offload_size, otherwise here, then yields to the loop.
+    """
+    if offload_size is not None and size >= offload_size:
+        return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+    result = function(*args)
+    await asyncio.sleep(0)
+    return result
+
+
+async def read_chunks(source:ByteSource, chunk_size:int=DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    yields the rest of source: up to chunk_size bytes at a time from a StreamReader, or each chunk of an async
+    iterator as it comes.
+    """
+    if isinstance(source, asyncio.StreamReader):
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in source:
+            if chunk:
+                yield bytes(chunk)
+
+
+async def encode_chunks(source:ByteSource, encoder:HuffmanEncoder, chunk_size:int=DEFAULT_CHUNK_SIZE,
+                        executor:Executor=None, offload_size:int=DEFAULT_OFFLOAD_SIZE) -> AsyncIterator[bytes]:
+    """
+    yields a whole compressed stream - magic, header, one record per chunk of source, end marker - as it is made.
+    :param encoder: a canonical encoder for bytes, with a code for every byte value source can contain.
+    :param executor: where chunks of offload_size bytes or more are encoded; None means the loop's default executor.
+    :param offload_size: the chunk size from which encoding is moved off the loop; None to never move it.
+    """
+    if encoder.code_table is None:
+        encoder.build_code_table()
+    yield MAGIC + encoder.get_header()
+    code_table = encoder.code_table
+    async for chunk in read_chunks(source, chunk_size):
+        yield await _run(encode_record, chunk, code_table, size=len(chunk), executor=executor,
+                         offload_size=offload_size)
+    yield bytes([0])
+
+
+class _AsyncByteReader():
+    """
+    reads exact numbers of bytes from a StreamReader or an async iterator of chunks, never more than asked for from
+    a StreamReader (so whatever follows a compressed stream on a connection is left in it).
+    """
+    def __init__(self, source:ByteSource):
+        self.reader = source if isinstance(source, asyncio.StreamReader) else None
+        self.chunks = None if self.reader is not None else source.__aiter__()
+        self.buffer = bytearray()
+
+    async def read_exactly(self, size:int) -> bytes:
+        if self.reader is not None:
+            try:
+                return await self.reader.readexactly(size)
+            except asyncio.IncompleteReadError as error:
+                raise ValueError(f"The compressed stream ended early: wanted {size} bytes, "
+                                 f"got {len(error.partial)}.") from None
+        while len(self.buffer) < size:
+            try:
+                self.buffer += await self.chunks.__anext__()
+            except StopAsyncIteration:
+                raise ValueError(f"The compressed stream ended early: wanted {size} bytes, "
+                                 f"got {len(self.buffer)}.") from None
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def read_varint(self) -> int:
+        number = 0
+        shift = 0
+        while True:
+            byte = (await self.read_exactly(1))[0]
+            number |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    async def read_header(self) -> Dict[int, int]:
+        header = bytearray(await self.read_exactly(1))
+        count = await self.read_varint()
+        write_varint(header, count)
+        for i in range(count):
+            write_varint(header, await self.read_varint())
+            header += await self.read_exactly(1)
+        lengths, _ = parse_code_lengths(header)
+        return lengths
+
+
+async def decode_chunks(source:ByteSource, executor:Executor=None,
+                        offload_size:int=DEFAULT_OFFLOAD_SIZE) -> AsyncIterator[bytes]:
+    """
+    reads one compressed stream from source and yields the original bytes, one chunk at a time. Stops at the
+    stream's end marker, so a connection can carry more after it.
+    :param executor: and offload_size: as for encode_chunks; offload_size counts compressed bytes.
+    """
+    reader = _AsyncByteReader(source)
+    if await reader.read_exactly(len(MAGIC)) != MAGIC:
+        raise ValueError("This is not a HuffmanStreamFile compressed stream.")
+    lengths = await reader.read_header()
+    decoder = HuffmanEncoder.from_code_lengths(lengths) if len(lengths) > 0 else None
+    while True:
+        symbol_count = await reader.read_varint()
+        if symbol_count == 0:
+            return
+        bit_length = await reader.read_varint()
+        data = await reader.read_exactly(-(-bit_length // 8))
+        if decoder is None:
+            raise ValueError("The compressed stream has data but no code.")
+        yield await _run(decode_record, decoder, data, bit_length, symbol_count, size=len(data), executor=executor,
+                         offload_size=offload_size)
+
+
+async def compress_to(source:ByteSource, writer:asyncio.StreamWriter, encoder:HuffmanEncoder=None,
+                      chunk_size:int=DEFAULT_CHUNK_SIZE, executor:Executor=None,
+                      offload_size:int=DEFAULT_OFFLOAD_SIZE):
+    """
+    compresses everything left in source into writer, waiting for the writer to drain after each chunk.
+    :param encoder: defaults to byte_encoder().
+    """
+    if encoder is None:
+        encoder = byte_encoder()
+    async for piece in encode_chunks(source, encoder, chunk_size, executor, offload_size):
+        writer.write(piece)
+        await writer.drain()
+
+
+async def decompress_to(source:ByteSource, writer:asyncio.StreamWriter, executor:Executor=None,
+                        offload_size:int=DEFAULT_OFFLOAD_SIZE):
+    """
+    decompresses one compressed stream from source into writer, waiting for the writer to drain after each chunk.
+    """
+    async for piece in decode_chunks(source, executor, offload_size):
+        writer.write(piece)
+        await writer.drain()
+
+
+async def _echo(reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+    """
+    the example server: decompresses one stream from the client and sends the same bytes back, compressed again.
+    """
+    try:
+        await compress_to(decode_chunks(reader), writer)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def _echo_example(payload:bytes, chunk_size:int, offload_size:int=DEFAULT_OFFLOAD_SIZE):
+    server = await asyncio.start_server(_echo, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+        async def payload_chunks():
+            for start in range(0, len(payload), chunk_size):
+                yield payload[start:start + chunk_size]
+
+        async def send():
+            await compress_to(payload_chunks(), writer, byte_encoder(payload[:chunk_size]), chunk_size,
+                             offload_size=offload_size)
+
+        async def receive() -> bytes:
+            return b"".join([chunk async for chunk in decode_chunks(reader, offload_size=offload_size)])
+
+        _, echoed = await asyncio.gather(send(), receive())
+        writer.close()
+        await writer.wait_closed()
+    if echoed != payload:
+        raise RuntimeError("The echoed payload does not match what was sent.")
+    print(f"echoed {len(payload)} bytes through 127.0.0.1:{port}")
+
+
+def main():
+    rng = random.Random(0)
+    words = [b"GET", b"POST", b"/index.html", b"200", b"404", b"OK", b"user", b"session", b"\n"]
+    payload = b" ".join(rng.choices(words, k=300000))
+    asyncio.run(_echo_example(payload, DEFAULT_CHUNK_SIZE))
+    # chunks smaller than DEFAULT_OFFLOAD_SIZE: have them coded in the default executor anyway.
+    asyncio.run(_echo_example(payload, DEFAULT_CHUNK_SIZE, offload_size=DEFAULT_CHUNK_SIZE // 4))
+    asyncio.run(_echo_example(b"", DEFAULT_CHUNK_SIZE))
+    asyncio.run(_echo_example(bytes(range(256)) * 4, 100))
+
+
+if __name__ == "__main__":
+    main()
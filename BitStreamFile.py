@@ -0,0 +1,175 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+_BIT_CHARACTERS = bytes.maketrans(b"\x00\x01", b"01")
+_BIT_VALUES = bytes.maketrans(b"01", b"\x00\x01")
+
+# once this many bits are waiting in the accumulator, the whole bytes among them are moved into the buffer.
+FLUSH_BITS = 512
+
+
+def flush_accumulator(buffer:bytearray, accumulator:int, pending:int) -> Tuple[int, int]:
+    """
+    moves the whole bytes among the pending bits of accumulator onto the end of buffer.
+    :return: the accumulator and pending count of the bits left over (fewer than 8).
+    """
+    leftover = pending & 7
+    buffer += (accumulator >> leftover).to_bytes(pending >> 3, "big")
+    return accumulator & ((1 << leftover) - 1), leftover
+
+
+class BitWriter():
+    """
+    Packs variable-length codes into a bytearray, most significant bit first. The last byte is padded with 0s, so
+    the writer keeps track of how many of the bits are real (bit_length) and how many are padding.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.accumulator = 0  # bits that have not yet made a whole byte
+        self.pending = 0  # number of bits in accumulator
+        self.bit_length = 0
+
+    def write(self, code:int, length:int):
+        """
+        appends the lowest length bits of code.
+        """
+        self.accumulator = (self.accumulator << length) | code
+        self.pending += length
+        self.bit_length += length
+        if self.pending >= FLUSH_BITS:
+            self.flush_whole_bytes()
+
+    def write_symbols(self, symbols:Iterable[Any], codes:Dict[Any, Tuple[int, int]]):
+        """
+        appends the code of every symbol in symbols.
+        :param symbols: the symbols to encode, e.g. a string.
+        :param codes: a dictionary {symbol -> (code, code_length)}.
+        raises a KeyError if one of the symbols has no code.
+        """
+        accumulator = self.accumulator
+        pending = self.pending
+        written = 0
+        buffer = self.buffer
+        try:
+            for symbol in symbols:
+                code, length = codes[symbol]
+                accumulator = (accumulator << length) | code
+                pending += length
+                written += length
+                if pending >= FLUSH_BITS:
+                    accumulator, pending = flush_accumulator(buffer, accumulator, pending)
+        except KeyError:
+            raise KeyError(f"The letter \'{symbol}\' was not contained in the key string.") from None
+        finally:
+            self.accumulator = accumulator
+            self.pending = pending
+            self.bit_length += written
+
+    def write_records(self, records:Iterable[Iterable[Any]], codes:Dict[Any, Tuple[int, int]], bit_offsets:List[int],
+                      symbol_offsets:List[int]):
+        """
+        appends the codes of many records (e.g. strings) back to back, like a write_symbols call for each, but in one
+        loop. After each record, the bit_length and the total number of symbols so far are appended to bit_offsets
+        and symbol_offsets (lists or arrays).
+        raises a KeyError if one of the symbols has no code.
+        """
+        accumulator = self.accumulator
+        pending = self.pending
+        bit_length = self.bit_length
+        symbol_count = symbol_offsets[-1] if len(symbol_offsets) > 0 else 0
+        buffer = self.buffer
+        add_bit_offset = bit_offsets.append
+        add_symbol_offset = symbol_offsets.append
+        try:
+            for record in records:
+                for symbol in record:
+                    code, length = codes[symbol]
+                    accumulator = (accumulator << length) | code
+                    pending += length
+                    bit_length += length
+                    if pending >= FLUSH_BITS:
+                        accumulator, pending = flush_accumulator(buffer, accumulator, pending)
+                symbol_count += len(record)
+                add_bit_offset(bit_length)
+                add_symbol_offset(symbol_count)
+        except KeyError:
+            raise KeyError(f"The letter \'{symbol}\' was not contained in the key string.") from None
+        finally:
+            self.accumulator = accumulator
+            self.pending = pending
+            self.bit_length = bit_length
+
+    def write_symbols_in_context(self, symbols:Iterable[Any], codes_by_context:Dict[Any, Dict[Any, Tuple[int, int]]],
+                                 default_codes:Dict[Any, Tuple[int, int]]):
+        """
+        like write_symbols, but each symbol is coded with the code of the symbol before it: codes_by_context[previous],
+        or default_codes for the first symbol and for any previous symbol that has no code of its own.
+        raises a KeyError if one of the symbols has no code in its context.
+        """
+        accumulator = self.accumulator
+        pending = self.pending
+        written = 0
+        buffer = self.buffer
+        codes = default_codes
+        try:
+            for symbol in symbols:
+                code, length = codes[symbol]
+                accumulator = (accumulator << length) | code
+                pending += length
+                written += length
+                if pending >= FLUSH_BITS:
+                    accumulator, pending = flush_accumulator(buffer, accumulator, pending)
+                codes = codes_by_context.get(symbol, default_codes)
+        except KeyError:
+            raise KeyError(f"The letter \'{symbol}\' was not contained in the key string.") from None
+        finally:
+            self.accumulator = accumulator
+            self.pending = pending
+            self.bit_length += written
+
+    def flush_whole_bytes(self):
+        self.accumulator, self.pending = flush_accumulator(self.buffer, self.accumulator, self.pending)
+
+    @property
+    def padding(self) -> int:
+        """
+        the number of 0 bits that getvalue() adds to fill the last byte.
+        """
+        return -self.bit_length % 8
+
+    def getvalue(self) -> bytearray:
+        """
+        gives the packed bits written so far, with the last byte padded out with 0s.
+        Nothing more should be written after this is called.
+        """
+        self.flush_whole_bytes()
+        if self.pending > 0:
+            self.buffer.append((self.accumulator << (8 - self.pending)) & 0xFF)
+            self.accumulator = 0
+            self.pending = 0
+        return self.buffer
+
+
+def pack_bits(bits:List[int]) -> bytes:
+    """
+    packs a list of 0s and 1s into bytes, most significant bit first. The last byte is padded with 0s.
+    """
+    if len(bits) == 0:
+        return b""
+    padding = -len(bits) % 8
+    digits = bytes(bits).translate(_BIT_CHARACTERS) + b"0" * padding
+    return int(digits, 2).to_bytes((len(bits) + padding) // 8, "big")
+
+
+def unpack_bits(data, bit_length:int) -> List[int]:
+    """
+    the reverse of pack_bits: gives the first bit_length bits of data as a list of 0s and 1s.
+    :param data: bytes or any other buffer-protocol object.
+    """
+    if bit_length == 0:
+        return []
+    data = memoryview(data).cast("B")
+    if bit_length > 8 * len(data):
+        raise ValueError(f"Asked for {bit_length} bits from only {len(data)} bytes.")
+    num_bytes = -(-bit_length // 8)
+    digits = format(int.from_bytes(data[:num_bytes], "big"), f"0{8 * num_bytes}b")[:bit_length]
+    return list(digits.encode("ascii").translate(_BIT_VALUES))
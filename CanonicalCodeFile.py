@@ -0,0 +1,150 @@
+from TreeNodesFile import *
+from DecodeTableFile import CodeTable, code_table_from_tree
+from typing import Any, Dict, List, Tuple
+
+# the first byte of a header says what kind of symbols it holds.
+SYMBOLS_ARE_STRINGS = 0
+SYMBOLS_ARE_INTS = 1
+
+
+def write_varint(buffer:bytearray, number:int):
+    """
+    appends a non-negative int to buffer, 7 bits per byte, low bits first; the high bit of each byte says whether
+    more bytes follow.
+    """
+    if number < 0:
+        raise ValueError(f"Cannot write a negative varint: {number}.")
+    while number >= 0x80:
+        buffer.append((number & 0x7F) | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def read_varint(data, offset:int) -> Tuple[int, int]:
+    """
+    reads a varint written by write_varint.
+    :return: (the number, the offset just after it)
+    """
+    number = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("The data ended in the middle of a varint.")
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, offset
+        shift += 7
+
+
+def code_lengths_from_tree(root:TreeNode[T]) -> Dict[Any, int]:
+    """
+    gives the depth of every leaf in the tree, which is all that a canonical code needs.
+    :return: a dictionary {symbol -> code_length}
+    """
+    return {symbol: length for symbol, (code, length) in code_table_from_tree(root).items()}
+
+
+def canonical_codes(lengths:Dict[Any, int]) -> CodeTable:
+    """
+    assigns canonical codes: symbols are sorted by (code_length, symbol), the first gets all 0s, and each one after
+    that gets the previous code plus one, shifted left whenever the length grows. Any two encoders that agree on the
+    lengths therefore agree on the codes.
+    :param lengths: a dictionary {symbol -> code_length}
+    :return: a dictionary {symbol -> (code, code_length)}
+    raises a ValueError if the lengths do not make a complete prefix code (e.g. a corrupt header): too many short
+    codes for a code to fit in its length, or too few for every bit string to start with a code.
+    """
+    codes:CodeTable = {}
+    code = 0
+    previous_length = 0
+    for symbol, length in sorted(lengths.items(), key=lambda item: (item[1], item[0])):
+        code <<= length - previous_length
+        if code >= 1 << length:
+            raise ValueError(f"The code lengths do not make a prefix code: no {length}-bit code is left for "
+                             f"{symbol!r}.")
+        codes[symbol] = (code, length)
+        code += 1
+        previous_length = length
+    if len(codes) > 0 and code != 1 << previous_length:
+        raise ValueError("The code lengths do not make a complete prefix code.")
+    return codes
+
+
+def tree_from_code_table(codes:CodeTable) -> TreeNode:
+    """
+    builds the JointNode/LeafNode tree whose paths are the given codes.
+    :param codes: a dictionary {symbol -> (code, code_length)} for a complete prefix code.
+    :return: the root of the tree.
+    """
+    if len(codes) == 1:
+        return LeafNode(next(iter(codes)))
+    # sorted by code, the leaves come left to right; rebuild bottom-up, joining siblings at each depth.
+    max_length = max(length for code, length in codes.values())
+    leaves = sorted(codes.items(), key=lambda item: item[1][0] << (max_length - item[1][1]))
+    stack:List[Tuple[TreeNode, int]] = []  # (subtree, depth of its root)
+    for symbol, (code, length) in leaves:
+        node:TreeNode = LeafNode(symbol)
+        depth = length
+        while len(stack) > 0 and stack[-1][1] == depth:
+            left, left_depth = stack.pop()
+            node = JointNode(left, node)
+            depth -= 1
+        stack.append((node, depth))
+    if len(stack) != 1 or stack[0][1] != 0:
+        raise ValueError("The code lengths do not make a complete prefix code.")
+    return stack[0][0]
+
+
+def serialize_code_lengths(lengths:Dict[Any, int]) -> bytes:
+    """
+    makes a compact header holding only the (symbol, code_length) pairs: a kind byte, the number of symbols, then
+    for each symbol (in order) the gap since the previous symbol as a varint, followed by one byte of length.
+    String symbols are stored by their code point, so they must each be a single character.
+    """
+    symbols = sorted(lengths.keys())
+    header = bytearray()
+    if all(isinstance(symbol, str) for symbol in symbols):
+        header.append(SYMBOLS_ARE_STRINGS)
+        numbers = [ord(symbol) for symbol in symbols]
+    elif all(isinstance(symbol, int) for symbol in symbols):
+        header.append(SYMBOLS_ARE_INTS)
+        numbers = symbols
+    else:
+        raise TypeError("Code length headers can only hold single-character strings or non-negative ints.")
+    write_varint(header, len(symbols))
+    previous = 0
+    for symbol, number in zip(symbols, numbers):
+        if lengths[symbol] > 255:
+            raise ValueError(f"The code for {symbol!r} is {lengths[symbol]} bits long; headers allow at most 255.")
+        write_varint(header, number - previous)
+        header.append(lengths[symbol])
+        previous = number
+    return bytes(header)
+
+
+def parse_code_lengths(data, offset:int=0) -> Tuple[Dict[Any, int], int]:
+    """
+    reads a header made by serialize_code_lengths.
+    :param data: bytes or any other buffer-protocol object.
+    :param offset: where the header starts in data.
+    :return: (a dictionary {symbol -> code_length}, the offset just after the header)
+    """
+    data = memoryview(data).cast("B")
+    if offset >= len(data):
+        raise ValueError("The data ended before the code length header.")
+    kind = data[offset]
+    if kind not in (SYMBOLS_ARE_STRINGS, SYMBOLS_ARE_INTS):
+        raise ValueError(f"Unknown code length header kind: {kind}.")
+    count, offset = read_varint(data, offset + 1)
+    lengths:Dict[Any, int] = {}
+    number = 0
+    for i in range(count):
+        gap, offset = read_varint(data, offset)
+        number += gap
+        if offset >= len(data):
+            raise ValueError("The data ended in the middle of the code length header.")
+        lengths[chr(number) if kind == SYMBOLS_ARE_STRINGS else number] = data[offset]
+        offset += 1
+    return lengths, offset
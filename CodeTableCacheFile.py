@@ -0,0 +1,202 @@
+"""
+A cache of built HuffmanEncoders, for encoding many small messages whose letter counts look alike.
+
+Each message's counts are reduced to a fingerprint: every letter's probability, quantized on a log scale. Messages
+with the same fingerprint reuse the same tree and tables instead of repeating do_setup. When the fingerprint is new,
+the pinned (pre-trained, never evicted) encoders and the few most recently used ones are tried before building a new
+one, since small messages from the same source often land just across a quantization step. The cache is bounded by
+an estimate of the memory its encoders use, and drops the least recently used ones first.
+"""
+import itertools
+import math
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+from HuffmanEncoderFile import HuffmanEncoder
+from LengthLimitedCodeFile import encoded_bit_count
+
+DEFAULT_MAX_BYTES = 16 << 20
+# a Huffman code is always less than 1 bit per letter worse than the entropy, so by default a cached code is good
+# enough if it is no worse than that.
+DEFAULT_MAX_OVERHEAD_BITS = 1.0
+DEFAULT_PROBE_COUNT = 4
+
+# rough costs used to estimate how much memory a cached encoder takes.
+_BYTES_PER_ENCODER = 4096  # the encoder and DecodeTable objects and their attributes
+_BYTES_PER_CODE = 200  # a code_table and freq_dict entry, and the symbol's shared decode table entry
+_BYTES_PER_TABLE_SLOT = 8
+_BYTES_PER_KEY_LETTER = 100  # a (letter, step) pair in a fingerprint
+
+Fingerprint = Tuple[Tuple[Any, int], ...]
+
+
+def fingerprint(frequencies:Dict[Any, int], steps_per_bit:float=1) -> Fingerprint:
+    """
+    quantizes a frequency profile: each letter's probability p becomes round(-log2(p) * steps_per_bit), which is
+    about its ideal code length. Profiles that differ only a little get the same fingerprint.
+    :return: a sorted tuple of (letter, quantized -log2 p) pairs.
+    """
+    total = sum(frequencies.values())
+    return tuple(sorted((letter, round(-math.log2(count / total) * steps_per_bit))
+                        for letter, count in frequencies.items()))
+
+
+def entropy_bits(frequencies:Dict[Any, int]) -> float:
+    """
+    the fewest bits any code could use for these counts.
+    """
+    total = sum(frequencies.values())
+    return -sum(count * math.log2(count / total) for count in frequencies.values())
+
+
+def compact_encoder(encoder:HuffmanEncoder) -> HuffmanEncoder:
+    """
+    drops everything but the code and decode tables (and the letter counts) from a built encoder, since those are all
+    that encoding and decoding use. Like an encoder made by from_header, it no longer has a tree, so
+    decode_message_with_tree cannot be used.
+    """
+    encoder.encoding_tree = None
+    encoder.encode_dictionary = {}
+    encoder.frequency_queue = None
+    encoder.encode_string = ""
+    return encoder
+
+
+def estimate_encoder_bytes(encoder:HuffmanEncoder) -> int:
+    """
+    a rough estimate of the memory held by a compact_encoder: its code table, letter counts and decode tables.
+    """
+    slots = 0
+    tables = [encoder.decode_table.table] if encoder.decode_table is not None else []
+    while len(tables) > 0:
+        table = tables.pop()
+        slots += len(table)
+        for symbol, length in table:
+            if length < 0:
+                tables.append(symbol)
+    return _BYTES_PER_ENCODER + _BYTES_PER_CODE * len(encoder.code_table) + _BYTES_PER_TABLE_SLOT * slots
+
+
+class CodeTableCache():
+    """
+    :param max_bytes: the most (estimated) memory the unpinned encoders may use.
+    :param steps_per_bit: how finely fingerprints are quantized; higher means fewer, but closer, matches.
+    :param max_overhead_bits: a cached code is only reused if it costs at most this many bits per letter more than
+    the message's entropy.
+    :param probe_count: how many of the most recently used encoders to try when the fingerprint is new.
+    :param encoder_options: passed to HuffmanEncoder for the encoders this cache builds (e.g. construction="two_queue").
+    """
+    def __init__(self, max_bytes:int=DEFAULT_MAX_BYTES, steps_per_bit:float=1,
+                 max_overhead_bits:float=DEFAULT_MAX_OVERHEAD_BITS, probe_count:int=DEFAULT_PROBE_COUNT,
+                 **encoder_options):
+        self.max_bytes = max_bytes
+        self.steps_per_bit = steps_per_bit
+        self.max_overhead_bits = max_overhead_bits
+        self.probe_count = probe_count
+        self.encoder_options = encoder_options
+        self.entries:"OrderedDict[Fingerprint, Tuple[HuffmanEncoder, int]]" = OrderedDict()  # oldest first
+        self.pinned:Dict[Hashable, HuffmanEncoder] = {}
+        self.current_bytes = 0
+        self.hits = 0  # exact fingerprint matches
+        self.near_hits = 0  # recently used encoders that fit a new fingerprint
+        self.pinned_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "near_hits": self.near_hits, "pinned_hits": self.pinned_hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self.entries), "pinned": len(self.pinned),
+                "bytes": self.current_bytes}
+
+    def pin(self, name:Hashable, encoder:HuffmanEncoder):
+        """
+        adds a pre-trained encoder that is never evicted.
+        """
+        if encoder.code_table is None:
+            encoder.build_code_table()
+        if encoder.decode_table is None:
+            encoder.build_decode_table()
+        self.pinned[name] = encoder
+
+    def unpin(self, name:Hashable):
+        del self.pinned[name]
+
+    def fits(self, encoder:HuffmanEncoder, frequencies:Dict[Any, int]) -> bool:
+        """
+        indicates whether encoder can encode every letter counted in frequencies, at most max_overhead_bits per
+        letter worse than their entropy.
+        """
+        codes = encoder.code_table
+        if any(letter not in codes for letter in frequencies):
+            return False
+        lengths = {letter: codes[letter][1] for letter in frequencies}
+        total = sum(frequencies.values())
+        overhead = encoded_bit_count(frequencies, lengths) - entropy_bits(frequencies)
+        return overhead <= self.max_overhead_bits * total
+
+    def best_fit(self, encoders, frequencies:Dict[Any, int]) -> HuffmanEncoder:
+        """
+        gives whichever of encoders fits frequencies and encodes them in the fewest bits, or None if none fit.
+        """
+        best:HuffmanEncoder = None
+        best_bits = None
+        for encoder in encoders:
+            if self.fits(encoder, frequencies):
+                bits = encoded_bit_count(frequencies, {letter: encoder.code_table[letter][1] for letter in frequencies})
+                if best is None or bits < best_bits:
+                    best = encoder
+                    best_bits = bits
+        return best
+
+    def encoder_for(self, message:str) -> HuffmanEncoder:
+        """
+        gives an encoder for message: a cached one if one fits, otherwise a newly built one (which is then cached).
+        """
+        frequencies = dict(Counter(message))
+        if len(frequencies) == 0:
+            raise ValueError("Cannot find an encoder for an empty message.")
+        key = fingerprint(frequencies, self.steps_per_bit)
+        entry = self.entries.get(key)
+        if entry is not None and self.fits(entry[0], frequencies):
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        best = self.best_fit(self.pinned.values(), frequencies)
+        if best is not None:
+            self.pinned_hits += 1
+            return best
+        recent_keys = list(itertools.islice(reversed(self.entries), self.probe_count))
+        recent = [self.entries[recent_key][0] for recent_key in recent_keys]
+        best = self.best_fit(recent, frequencies)
+        if best is not None:
+            self.near_hits += 1
+            self.entries.move_to_end(recent_keys[recent.index(best)])
+            return best
+        self.misses += 1
+        encoder = compact_encoder(HuffmanEncoder.from_frequencies(frequencies, **self.encoder_options))
+        self.store(key, encoder)
+        return encoder
+
+    def store(self, key:Fingerprint, encoder:HuffmanEncoder):
+        """
+        caches encoder under key, evicting the least recently used encoders until everything fits in max_bytes.
+        An encoder bigger than max_bytes on its own is not cached.
+        """
+        size = estimate_encoder_bytes(encoder) + _BYTES_PER_KEY_LETTER * len(key)
+        if key in self.entries:
+            self.current_bytes -= self.entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        while self.current_bytes + size > self.max_bytes and len(self.entries) > 0:
+            old_key, (old_encoder, old_size) = self.entries.popitem(last=False)
+            self.current_bytes -= old_size
+            self.evictions += 1
+        self.entries[key] = (encoder, size)
+        self.current_bytes += size
+
+    def clear(self):
+        """
+        drops every unpinned encoder (the counters are kept).
+        """
+        self.entries.clear()
+        self.current_bytes = 0
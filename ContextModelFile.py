@@ -0,0 +1,278 @@
+"""
+Order-1 context modeling: a separate Huffman code for each preceding symbol.
+
+In text and logs, the symbol before tells a lot about the next one (after "q" comes "u"; after a newline, a
+timestamp), which a single order-0 code cannot use. A ContextHuffmanCoder codes each symbol with a code built from
+the counts of what followed the same previous symbol. Each such code is built by HuffmanEncoder from its counts, on
+the usual PriorityQueue path, then made canonical so only its code lengths need storing. A context only gets a
+code of its own if that saves more bits than its code-length header costs; every other context (the rare ones, and
+the first symbol, which has no context) uses the fallback: one order-0 code over the whole message.
+
+    python -m ContextModelFile [file ...] [--min-context-count N] [--json]
+
+compares the compressed size of each file (or of the benchmark corpora, if no files are given) with one order-0
+code and with order-1 contexts.
+
+Compressed format (compress / decompress):
+    MAGIC
+    the fallback code-length header (see CanonicalCodeFile.serialize_code_lengths)
+    varint context count, then for each context (in order of symbol): the gap since the previous context's symbol as a
+    varint, and the context's own code-length header
+    varint symbol_count, varint bit_length, ceil(bit_length / 8) bytes of packed bits
+"""
+import argparse
+import json
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from HuffmanEncoderFile import HuffmanEncoder
+from DecodeTableFile import DecodeTable, CodeTable, DEFAULT_LOOKUP_BITS, refill_bits, lookup_symbol
+from BitStreamFile import BitWriter
+from CanonicalCodeFile import canonical_codes, serialize_code_lengths, parse_code_lengths, write_varint, read_varint
+from LengthLimitedCodeFile import encoded_bit_count
+
+MAGIC = b"HUFC"
+# contexts seen fewer times than this use the fallback code without being considered for a code of their own.
+DEFAULT_MIN_CONTEXT_COUNT = 16
+
+Lengths = Dict[Any, int]
+
+
+def count_contexts(message) -> Tuple[Dict[Any, int], Dict[Any, Dict[Any, int]]]:
+    """
+    counts the symbols of message, and for every symbol, the symbols that come right after it.
+    :param message: a string, or bytes.
+    :return: ({symbol -> count}, {previous symbol -> {symbol -> count}})
+    """
+    contexts:Dict[Any, Dict[Any, int]] = {}
+    for (previous, symbol), count in Counter(zip(message, message[1:])).items():
+        contexts.setdefault(previous, {})[symbol] = count
+    return dict(Counter(message)), contexts
+
+
+def _code_lengths(frequencies:Dict[Any, int]) -> Lengths:
+    encoder = HuffmanEncoder.from_frequencies(frequencies, canonical=True)
+    return {symbol: length for symbol, (code, length) in encoder.code_table.items()}
+
+
+def _symbol_number(symbol:Any) -> int:
+    return ord(symbol) if isinstance(symbol, str) else symbol
+
+
+class ContextHuffmanCoder():
+    """
+    :param fallback_lengths: the order-0 code, as {symbol -> code_length}; it must hold every symbol.
+    :param context_lengths: the codes of the contexts that have their own, as {previous symbol -> {symbol ->
+    code_length}}.
+    """
+    def __init__(self, fallback_lengths:Lengths, context_lengths:Dict[Any, Lengths]=None,
+                 lookup_bits:int=DEFAULT_LOOKUP_BITS):
+        if len(fallback_lengths) == 0:
+            raise ValueError("The fallback code needs at least one symbol.")
+        self.fallback_lengths = fallback_lengths
+        self.context_lengths = context_lengths if context_lengths is not None else {}
+        self.fallback_codes:CodeTable = canonical_codes(fallback_lengths)
+        self.context_codes:Dict[Any, CodeTable] = {context: canonical_codes(lengths)
+                                                   for context, lengths in self.context_lengths.items()}
+        self.lookup_bits = lookup_bits
+        self.fallback_table = DecodeTable(self.fallback_codes, lookup_bits)
+        self.context_tables:Dict[Any, DecodeTable] = {context: DecodeTable(codes, lookup_bits)
+                                                      for context, codes in self.context_codes.items()}
+        self.text = all(isinstance(symbol, str) for symbol in fallback_lengths)
+
+    @classmethod
+    def train(cls, message, min_context_count:int=DEFAULT_MIN_CONTEXT_COUNT,
+              lookup_bits:int=DEFAULT_LOOKUP_BITS) -> "ContextHuffmanCoder":
+        """
+        builds the codes for message: the order-0 fallback, plus a code for every context seen at least
+        min_context_count times whose own code (with its header) takes fewer bits than the fallback would.
+        """
+        if len(message) == 0:
+            raise ValueError("Cannot train a context model on an empty message.")
+        frequencies, contexts = count_contexts(message)
+        fallback_lengths = _code_lengths(frequencies)
+        context_lengths:Dict[Any, Lengths] = {}
+        for context, counts in contexts.items():
+            if sum(counts.values()) < min_context_count:
+                continue
+            lengths = _code_lengths(counts)
+            # the header, plus about one byte for the context's own symbol.
+            header_bits = 8 * (len(serialize_code_lengths(lengths)) + 1)
+            if encoded_bit_count(counts, lengths) + header_bits < encoded_bit_count(counts, fallback_lengths):
+                context_lengths[context] = lengths
+        return cls(fallback_lengths, context_lengths, lookup_bits)
+
+    def encode(self, message) -> Tuple[bytearray, int]:
+        """
+        :return: (the packed bits, the number of bits)
+        raises a KeyError if a symbol has no code where it appears.
+        """
+        writer = BitWriter()
+        writer.write_symbols_in_context(message, self.context_codes, self.fallback_codes)
+        return writer.getvalue(), writer.bit_length
+
+    def decode_symbols(self, data, bit_length:int, symbol_count:int) -> List[Any]:
+        """
+        decodes symbol_count symbols from the first bit_length bits of data, switching to the code of each symbol's
+        context as it goes. A code with a single symbol takes no bits, so the count is needed to know where to stop.
+        raises a ValueError if the bits run out early, or are not all used.
+        """
+        data = memoryview(data).cast("B")
+        if bit_length > 8 * len(data):
+            raise ValueError(f"Asked to decode {bit_length} bits from only {len(data)} bytes.")
+
+        def plan(table:DecodeTable):
+            only = next(iter(table.codes)) if table.max_length == 0 else None
+            return table.table, table.lookup_bits, (1 << table.lookup_bits) - 1, table.window_bits, only
+        fallback_plan = plan(self.fallback_table)
+        plans = {context: plan(table) for context, table in self.context_tables.items()}
+        window_bits = max([fallback_plan[3]] + [context_plan[3] for context_plan in plans.values()])
+
+        output:List[Any] = [None] * symbol_count
+        num_bytes = len(data)
+        accumulator = 0
+        available = 0  # number of unread bits held in accumulator
+        byte_position = 0
+        remaining = bit_length
+        table, k, mask, table_window_bits, only = fallback_plan
+        for count in range(symbol_count):
+            if only is not None:
+                symbol = only
+            else:
+                if available < window_bits and byte_position < num_bytes:
+                    accumulator, available, byte_position = refill_bits(data, byte_position, accumulator, available,
+                                                                        window_bits)
+                if available >= table_window_bits:
+                    # the common case, a code that ends within the first table, is looked up here.
+                    symbol, length = table[(accumulator >> (available - k)) & mask]
+                else:
+                    length = -1
+                if length < 0:
+                    symbol, length = lookup_symbol(table, k, mask, table_window_bits, accumulator, available)
+                if length == 0 or length > remaining:
+                    raise ValueError(f"The encoded message ends in the middle of a code, after {count} symbols.")
+                available -= length
+                remaining -= length
+            output[count] = symbol
+            table, k, mask, table_window_bits, only = plans.get(symbol, fallback_plan)
+        if remaining != 0:
+            raise ValueError(f"{remaining} bits were left over after decoding {symbol_count} symbols.")
+        return output
+
+    def decode(self, data, bit_length:int, symbol_count:int):
+        """
+        like decode_symbols, but gives a string (or bytes, for a model of bytes).
+        """
+        symbols = self.decode_symbols(data, bit_length, symbol_count)
+        return "".join(symbols) if self.text else bytes(symbols)
+
+    def to_bytes(self) -> bytes:
+        """
+        serializes the model: the fallback header, then every context's header.
+        """
+        result = bytearray(serialize_code_lengths(self.fallback_lengths))
+        write_varint(result, len(self.context_lengths))
+        previous = 0
+        for context in sorted(self.context_lengths):
+            number = _symbol_number(context)
+            write_varint(result, number - previous)
+            result += serialize_code_lengths(self.context_lengths[context])
+            previous = number
+        return bytes(result)
+
+    @classmethod
+    def from_bytes(cls, data, offset:int=0, lookup_bits:int=DEFAULT_LOOKUP_BITS) -> Tuple["ContextHuffmanCoder", int]:
+        """
+        reads a model made by to_bytes.
+        :return: (the model, the offset just after it)
+        """
+        data = memoryview(data).cast("B")
+        fallback_lengths, offset = parse_code_lengths(data, offset)
+        text = all(isinstance(symbol, str) for symbol in fallback_lengths)
+        context_count, offset = read_varint(data, offset)
+        context_lengths:Dict[Any, Lengths] = {}
+        number = 0
+        for i in range(context_count):
+            gap, offset = read_varint(data, offset)
+            number += gap
+            context_lengths[chr(number) if text else number], offset = parse_code_lengths(data, offset)
+        return cls(fallback_lengths, context_lengths, lookup_bits), offset
+
+
+def compress(message, min_context_count:int=DEFAULT_MIN_CONTEXT_COUNT) -> bytes:
+    """
+    trains a ContextHuffmanCoder on message and gives the model and the encoded message together.
+    """
+    coder = ContextHuffmanCoder.train(message, min_context_count)
+    data, bit_length = coder.encode(message)
+    result = bytearray(MAGIC)
+    result += coder.to_bytes()
+    write_varint(result, len(message))
+    write_varint(result, bit_length)
+    result += data
+    return bytes(result)
+
+
+def decompress(data):
+    """
+    the reverse of compress.
+    :return: a string, or bytes if bytes were compressed.
+    """
+    data = memoryview(data).cast("B")
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("This is not a ContextModelFile compressed message.")
+    coder, offset = ContextHuffmanCoder.from_bytes(data, len(MAGIC))
+    symbol_count, offset = read_varint(data, offset)
+    bit_length, offset = read_varint(data, offset)
+    return coder.decode(data[offset:], bit_length, symbol_count)
+
+
+def size_report(message, min_context_count:int=DEFAULT_MIN_CONTEXT_COUNT) -> Dict[str, Any]:
+    """
+    compares one order-0 code with order-1 contexts on message. Both sizes are the code headers plus the packed bits
+    (without compress's magic and length fields).
+    :return: a dictionary with the original size in symbols, both compressed sizes in bytes, how many contexts got
+    their own code, and the fraction of the order-0 size that the contexts save.
+    """
+    frequencies = dict(Counter(message))
+    order0 = HuffmanEncoder.from_frequencies(frequencies, canonical=True)
+    order0_bits = encoded_bit_count(frequencies, {symbol: length for symbol, (code, length) in order0.code_table.items()})
+    order0_bytes = len(order0.get_header()) + -(-order0_bits // 8)
+    coder = ContextHuffmanCoder.train(message, min_context_count)
+    model_bytes = len(coder.to_bytes())
+    order1_bytes = model_bytes + -(-coder.encode(message)[1] // 8)
+    return {"symbols": len(message), "order0_bytes": order0_bytes, "order1_bytes": order1_bytes,
+            "model_bytes": model_bytes, "contexts": len(coder.context_lengths),
+            "gain": (order0_bytes - order1_bytes) / order0_bytes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ContextModelFile",
+                                     description="Compare order-0 and order-1 (context) Huffman coding sizes.")
+    parser.add_argument("files", nargs="*", help="files to measure (default: the benchmark corpora)")
+    parser.add_argument("--min-context-count", type=int, default=DEFAULT_MIN_CONTEXT_COUNT)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    datasets:Dict[str, Any] = {}
+    if len(args.files) > 0:
+        for path in args.files:
+            with open(path, "rb") as file:
+                datasets[path] = file.read()
+    else:
+        from HuffmanBenchmarkFile import make_corpus, DEFAULT_SEED
+        for kind in ("uniform", "zipfian", "english", "binary"):
+            datasets[kind] = make_corpus(kind, 200000, DEFAULT_SEED)
+    report = {name: size_report(message, args.min_context_count)
+              for name, message in datasets.items() if len(message) > 0}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'dataset':30} {'symbols':>10} {'order-0':>10} {'order-1':>10} {'contexts':>8} {'gain':>7}")
+    for name, row in report.items():
+        print(f"{name:30} {row['symbols']:10} {row['order0_bytes']:10} {row['order1_bytes']:10} "
+              f"{row['contexts']:8} {row['gain']:+7.1%}")
+
+
+if __name__ == "__main__":
+    main()
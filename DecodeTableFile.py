@@ -0,0 +1,183 @@
+from TreeNodesFile import *
+from FlatTreeFile import FlatTree
+from BitStreamFile import pack_bits
+from typing import Dict, List, Tuple, Any
+
+DEFAULT_LOOKUP_BITS = 10
+
+# maps each symbol to (code, code_length), where code is the path through the tree read as a binary number.
+CodeTable = Dict[Any, Tuple[int, int]]
+
+
+def code_table_from_tree(root:TreeNode[T]) -> CodeTable:
+    """
+    walks the given Huffman tree (without recursion) and finds the code of every leaf.
+    :param root: the root of a tree made of JointNodes and LeafNodes, or a FlatTree.
+    :return: a dictionary {symbol -> (code, code_length)}. A tree that is a single leaf gets the empty code (0, 0).
+    """
+    if isinstance(root, FlatTree):
+        return root.code_table()
+    codes:CodeTable = {}
+    stack:List[Tuple[TreeNode[T], int, int]] = [(root, 0, 0)]
+    while len(stack) > 0:
+        node, code, length = stack.pop()
+        if isinstance(node, JointNode):
+            stack.append((node.right, (code << 1) | 1, length + 1))
+            stack.append((node.left, code << 1, length + 1))
+        else:
+            codes[node.value] = (code, length)
+    return codes
+
+
+def refill_bits(data:memoryview, byte_position:int, accumulator:int, available:int,
+                window_bits:int) -> Tuple[int, int, int]:
+    """
+    tops up a bit accumulator from data until it holds at least window_bits unread bits, or data runs out.
+    :param data: the packed bits, as a memoryview of bytes.
+    :param byte_position: the first byte of data not yet in the accumulator.
+    :param available: how many of the lowest bits of accumulator are unread; the bits above them are dropped.
+    :return: (accumulator, available, byte_position) after the refill.
+    """
+    accumulator &= (1 << available) - 1
+    num_bytes = len(data)
+    while available < window_bits and byte_position < num_bytes:
+        chunk = data[byte_position:byte_position + 64]
+        byte_position += len(chunk)
+        accumulator = (accumulator << (8 * len(chunk))) | int.from_bytes(chunk, "big")
+        available += 8 * len(chunk)
+    return accumulator, available, byte_position
+
+
+def lookup_symbol(table:List[Tuple[Any, int]], k:int, mask:int, window_bits:int, accumulator:int,
+                  available:int) -> Tuple[Any, int]:
+    """
+    finds the code at the start of the unread bits of an accumulator, following sub-tables for long codes.
+    :param table: and k, mask, window_bits: a DecodeTable's table, lookup_bits, (1 << lookup_bits) - 1 and window_bits.
+    :param available: how many of the lowest bits of accumulator are unread. If fewer than window_bits, the missing
+    bits are taken to be 0s (near the end of the data).
+    :return: (symbol, code_length). A code_length of 0 means the bits match no code.
+    """
+    if available < window_bits:
+        accumulator = (accumulator & ((1 << available) - 1)) << (window_bits - available)
+        available = window_bits
+    symbol, length = table[(accumulator >> (available - k)) & mask]
+    level_end = k
+    while length < 0:
+        level_end += k
+        symbol, length = symbol[(accumulator >> (available - level_end)) & mask]
+    return symbol, length
+
+
+class DecodeTable():
+    """
+    A table-driven decoder for a prefix code. Instead of walking the tree one bit at a time, we peek at the next
+    lookup_bits bits and find the symbol and its code length with a single list lookup. Codes longer than
+    lookup_bits continue into a sub-table for the next lookup_bits bits, and so on.
+    Each table entry is a tuple (symbol, code_length); an entry whose length is -1 holds a sub-table instead of a symbol.
+    """
+    def __init__(self, codes:CodeTable, lookup_bits:int=DEFAULT_LOOKUP_BITS):
+        if len(codes) == 0:
+            raise ValueError("Cannot build a decode table for an empty code.")
+        if lookup_bits < 1:
+            raise ValueError(f"lookup_bits must be at least 1, not {lookup_bits}.")
+        self.codes = codes
+        self.max_length = max(length for code, length in codes.values())
+        self.min_length = min(length for code, length in codes.values())
+        self.lookup_bits = max(1, min(lookup_bits, self.max_length))
+        levels = -(-self.max_length // self.lookup_bits)  # ceiling division
+        self.window_bits = max(1, levels) * self.lookup_bits
+        self.table = self.build_level(list(codes.items()), 0)
+
+    @classmethod
+    def from_tree(cls, root:TreeNode[T], lookup_bits:int=DEFAULT_LOOKUP_BITS) -> "DecodeTable":
+        return cls(code_table_from_tree(root), lookup_bits)
+
+    def build_level(self, entries:List[Tuple[Any, Tuple[int, int]]], level:int) -> List[Tuple[Any, int]]:
+        """
+        builds the table that decodes bits [level * lookup_bits, (level+1) * lookup_bits) of a code.
+        :param entries: the (symbol, (code, length)) pairs whose earlier bits all lead to this table.
+        :param level: how many lookup_bits-wide steps came before this table.
+        :return: a list of 2 ** lookup_bits (symbol, code_length) entries.
+        """
+        k = self.lookup_bits
+        level_end = (level + 1) * k
+        table:List[Tuple[Any, int]] = [(None, 0)] * (1 << k)
+        longer_codes:Dict[int, List[Tuple[Any, Tuple[int, int]]]] = {}
+        for symbol, (code, length) in entries:
+            if length <= level_end:
+                # the last (level_end - length) bits of the index don't matter, so fill every index that starts
+                # with this code's remaining bits.
+                start = (code << (level_end - length)) & ((1 << k) - 1)
+                entry = (symbol, length)  # one tuple shared by all its slots
+                for index in range(start, start + (1 << (level_end - length))):
+                    table[index] = entry
+            else:
+                index = (code >> (length - level_end)) & ((1 << k) - 1)
+                longer_codes.setdefault(index, []).append((symbol, (code, length)))
+        for index, sub_entries in longer_codes.items():
+            table[index] = (self.build_level(sub_entries, level + 1), -1)
+        return table
+
+    def decode_symbols(self, data, bit_length:int, start_bit:int=0, max_symbols:int=None) -> List[Any]:
+        """
+        decodes the first bit_length bits of data.
+        :param data: packed bits, most significant bit first - bytes, bytearray, memoryview or any buffer-protocol object.
+        :param bit_length: the number of meaningful bits in data; any bits after it are padding.
+        :param start_bit: where to start decoding; it must be the start of a code (e.g. a sync point).
+        :param max_symbols: if given, stop after decoding this many symbols.
+        :return: the list of decoded symbols.
+        raises a ValueError if the bits end in the middle of a code.
+        """
+        if self.max_length == 0:
+            return []  # a one-symbol tree has nothing to read.
+        data = memoryview(data).cast("B")
+        if bit_length > 8 * len(data):
+            raise ValueError(f"Asked to decode {bit_length} bits from only {len(data)} bytes.")
+        if start_bit < 0 or start_bit > bit_length:
+            raise ValueError(f"Cannot start decoding at bit {start_bit} of {bit_length}.")
+        k = self.lookup_bits
+        mask = (1 << k) - 1
+        window_bits = self.window_bits
+        table = self.table
+        num_bytes = len(data)
+        remaining = bit_length - start_bit
+        limit = remaining // max(1, self.min_length)
+        if max_symbols is not None:
+            limit = min(limit, max_symbols)
+        else:
+            max_symbols = -1  # never reached, so only the end of the bits stops the loop
+        output:List[Any] = [None] * limit
+        count = 0
+        accumulator = 0
+        available = 0  # number of unread bits held in accumulator
+        byte_position = start_bit >> 3
+        if start_bit & 7:
+            # the higher bits of the first byte come before start_bit, so they are never used.
+            accumulator = data[byte_position]
+            available = 8 - (start_bit & 7)
+            byte_position += 1
+        while remaining > 0 and count != max_symbols:
+            if available < window_bits and byte_position < num_bytes:
+                accumulator, available, byte_position = refill_bits(data, byte_position, accumulator, available,
+                                                                    window_bits)
+            if available >= window_bits:
+                # the common case, a code that ends within the first table, is looked up here.
+                symbol, length = table[(accumulator >> (available - k)) & mask]
+            else:
+                length = -1
+            if length < 0:
+                symbol, length = lookup_symbol(table, k, mask, window_bits, accumulator, available)
+            if length == 0 or length > remaining:
+                raise ValueError(f"The encoded message ends in the middle of a code, {remaining} bits from the end.")
+            available -= length
+            remaining -= length
+            output[count] = symbol
+            count += 1
+        del output[count:]
+        return output
+
+    def decode_bit_list(self, bits:List[int]) -> List[Any]:
+        """
+        decodes a list of 0s and 1s.
+        """
+        return self.decode_symbols(pack_bits(bits), len(bits))
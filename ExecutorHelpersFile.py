@@ -0,0 +1,20 @@
+"""
+Helpers shared by the modules that spread work across a concurrent.futures executor.
+"""
+from collections import deque
+from concurrent.futures import Executor
+from typing import Iterable, Iterator
+
+
+def in_order(executor:Executor, function, items:Iterable, max_pending:int) -> Iterator:
+    """
+    like executor.map, but only keeps max_pending items in flight, so a huge input is never all in memory at once.
+    :return: an iterator over function(item) for every item, in the order of items.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while len(pending) > 0:
+        yield pending.popleft().result()
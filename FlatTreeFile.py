@@ -0,0 +1,166 @@
+from TreeNodesFile import *
+from array import array
+from typing import Any, Dict, List, Tuple
+
+NO_CHILD = -1
+
+
+class FlatTree():
+    """
+    A compact Huffman tree: instead of one TreeNode object per node, the nodes are numbered, and three parallel
+    columns indexed by node id hold each node's left child, right child and symbol. The child columns are typed
+    arrays (4 bytes per entry), so a tree costs a few bytes per node instead of a whole object with a __dict__.
+    A leaf has NO_CHILD in both child columns; a joint node has None as its symbol.
+    Every traversal here uses an explicit stack, so deep trees can't hit the recursion limit.
+    """
+    def __init__(self):
+        self.left = array("i")
+        self.right = array("i")
+        self.symbols:List[Any] = []
+        self.root:int = NO_CHILD
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def add_leaf(self, symbol:Any) -> int:
+        """
+        adds a leaf holding symbol and gives its node id.
+        """
+        self.left.append(NO_CHILD)
+        self.right.append(NO_CHILD)
+        self.symbols.append(symbol)
+        return len(self.symbols) - 1
+
+    def add_joint(self, left:int, right:int) -> int:
+        """
+        adds a joint node with the given children (node ids) and gives its node id.
+        """
+        self.left.append(left)
+        self.right.append(right)
+        self.symbols.append(None)
+        return len(self.symbols) - 1
+
+    def is_leaf(self, node:int) -> bool:
+        return self.left[node] == NO_CHILD
+
+    @classmethod
+    def from_tree(cls, root:TreeNode[T]) -> "FlatTree":
+        """
+        copies a tree of JointNodes and LeafNodes. Node ids are given out in preorder, so the root is node 0.
+        """
+        flat = cls()
+        stack:List[Tuple[TreeNode[T], int, bool]] = [(root, NO_CHILD, False)]  # (node, parent id, is right child)
+        while len(stack) > 0:
+            node, parent, is_right = stack.pop()
+            if isinstance(node, JointNode):
+                node_id = flat.add_joint(NO_CHILD, NO_CHILD)
+                stack.append((node.right, node_id, True))
+                stack.append((node.left, node_id, False))
+            else:
+                node_id = flat.add_leaf(node.value)
+            if parent == NO_CHILD:
+                flat.root = node_id
+            elif is_right:
+                flat.right[parent] = node_id
+            else:
+                flat.left[parent] = node_id
+        return flat
+
+    def to_tree(self) -> TreeNode:
+        """
+        rebuilds this tree out of JointNodes and LeafNodes.
+        """
+        built:Dict[int, TreeNode] = {}
+        stack:List[Tuple[int, bool]] = [(self.root, False)]  # (node id, are its children built yet?)
+        while len(stack) > 0:
+            node, children_built = stack.pop()
+            if self.is_leaf(node):
+                built[node] = LeafNode(self.symbols[node])
+            elif children_built:
+                built[node] = JointNode(built.pop(self.left[node]), built.pop(self.right[node]))
+            else:
+                stack.append((node, True))
+                stack.append((self.right[node], False))
+                stack.append((self.left[node], False))
+        return built[self.root]
+
+    @classmethod
+    def from_code_table(cls, codes:Dict[Any, Tuple[int, int]]) -> "FlatTree":
+        """
+        builds the tree whose paths are the given codes.
+        :param codes: a dictionary {symbol -> (code, code_length)} for a complete prefix code.
+        raises a ValueError if the codes are not a complete prefix code.
+        """
+        flat = cls()
+        if len(codes) == 1 and next(iter(codes.values()))[1] == 0:
+            flat.root = flat.add_leaf(next(iter(codes)))
+            return flat
+        flat.root = flat.add_joint(NO_CHILD, NO_CHILD)
+        for symbol, (code, length) in codes.items():
+            if length == 0:
+                raise ValueError("Only a code with a single symbol can have an empty code.")
+            node = flat.root
+            for depth in range(length - 1, -1, -1):
+                if flat.is_leaf(node) and flat.symbols[node] is not None:
+                    raise ValueError(f"The code for {symbol!r} starts with another symbol's code.")
+                column = flat.right if (code >> depth) & 1 else flat.left
+                child = column[node]
+                if child == NO_CHILD:
+                    child = flat.add_leaf(symbol) if depth == 0 else flat.add_joint(NO_CHILD, NO_CHILD)
+                    column[node] = child
+                elif depth == 0:
+                    raise ValueError(f"The code for {symbol!r} is also used for another symbol.")
+                node = child
+        for node in range(len(flat)):
+            if flat.symbols[node] is None and (flat.left[node] == NO_CHILD or flat.right[node] == NO_CHILD):
+                raise ValueError("The codes do not make a complete prefix code.")
+        return flat
+
+    def code_table(self) -> Dict[Any, Tuple[int, int]]:
+        """
+        finds the code of every leaf.
+        :return: a dictionary {symbol -> (code, code_length)}
+        """
+        codes:Dict[Any, Tuple[int, int]] = {}
+        stack:List[Tuple[int, int, int]] = [(self.root, 0, 0)]
+        while len(stack) > 0:
+            node, code, length = stack.pop()
+            if self.is_leaf(node):
+                codes[self.symbols[node]] = (code, length)
+            else:
+                stack.append((self.right[node], (code << 1) | 1, length + 1))
+                stack.append((self.left[node], code << 1, length + 1))
+        return codes
+
+    def decode_bit_list(self, bits:List[int]) -> List[Any]:
+        """
+        the reference decoder: walks the tree one bit at a time.
+        """
+        left = self.left
+        right = self.right
+        symbols = self.symbols
+        result:List[Any] = []
+        index = 0
+        while index < len(bits):
+            node = self.root
+            while left[node] != NO_CHILD:
+                node = left[node] if bits[index] == 0 else right[node]
+                index += 1
+            result.append(symbols[node])
+        return result
+
+    def print_tree(self, indentation_level:int=0):
+        """
+        used to visualize this tree, in the same layout as JointNode.print_tree.
+        """
+        stack:List[Tuple[int, int, bool]] = [(self.root, indentation_level, False)]  # (node id, level, left done?)
+        while len(stack) > 0:
+            node, level, left_done = stack.pop()
+            if self.is_leaf(node):
+                print(f"{' ' * (4 * level)}{LeafNode(self.symbols[node])}")
+            elif left_done:
+                print(f"{' ' * (4 * level)}", end="<\n")
+                stack.append((self.right[node], level + 1, False))
+            else:
+                stack.append((node, level, True))
+                stack.append((self.left[node], level + 1, False))
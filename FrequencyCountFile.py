@@ -0,0 +1,96 @@
+"""
+Counting letters (or bytes) in parallel, for building one code over a large corpus.
+
+The input is split into shards, each shard is counted in a worker process, and the shard counts are merged. Shard
+counts are plain dictionaries {symbol -> count} kept in order of first appearance, and merge_counts adds them up in
+shard order, so the merged dictionary is exactly what HuffmanEncoder.build_frequency_dictionary makes from the whole
+input - same counts, same key order - and HuffmanEncoder.from_frequencies builds exactly the same tree from it.
+Counts from separate runs (e.g. one per file) can be merged the same way.
+"""
+import mmap
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from ExecutorHelpersFile import in_order
+
+DEFAULT_SHARD_SIZE = 1 << 22
+
+Counts = Dict[Any, int]
+
+
+def count_shard(shard) -> Counts:
+    """
+    counts one shard. Runs in a worker process.
+    :param shard: a string (counting its letters) or bytes (counting its byte values).
+    :return: a dictionary {symbol -> count}, in order of first appearance.
+    """
+    return dict(Counter(shard))
+
+
+def merge_counts(shard_counts:Iterable[Counts]) -> Counts:
+    """
+    adds up counts, keeping the order in which symbols first appear (so give the shards in input order).
+    """
+    merged:Counts = {}
+    for counts in shard_counts:
+        for symbol, count in counts.items():
+            merged[symbol] = merged.get(symbol, 0) + count
+    return merged
+
+
+def split_shards(data, shard_size:int=DEFAULT_SHARD_SIZE) -> Iterator:
+    """
+    yields data, shard_size symbols at a time. Pieces of a buffer (e.g. a memoryview or mmap) are copied to bytes
+    one shard at a time, so they can be sent to a worker.
+    """
+    if shard_size < 1:
+        raise ValueError(f"The shard size must be at least 1, not {shard_size}.")
+    if not isinstance(data, (str, bytes)):
+        data = memoryview(data).cast("B")
+    for start in range(0, len(data), shard_size):
+        shard = data[start:start + shard_size]
+        yield shard if isinstance(shard, (str, bytes)) else shard.tobytes()
+
+
+def count_frequencies(data, max_workers:int=None, shard_size:int=DEFAULT_SHARD_SIZE) -> Counts:
+    """
+    counts the letters of a string, or the byte values of bytes or any other buffer, across a pool of processes.
+    :param max_workers: the number of worker processes; defaults to one per CPU. With 1, or data no bigger than one
+    shard, everything is counted here instead.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(data) <= shard_size:
+        return merge_counts(count_shard(shard) for shard in split_shards(data, shard_size))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return merge_counts(in_order(executor, count_shard, split_shards(data, shard_size), 2 * max_workers))
+
+
+def _count_file_shard(job:Tuple[str, int, int]) -> Counts:
+    """
+    counts the bytes of one range of a file, mapping just that file into this (worker) process.
+    """
+    path, start, stop = job
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return count_shard(mapped[start:stop])
+
+
+def count_file_frequencies(path:str, max_workers:int=None, shard_size:int=DEFAULT_SHARD_SIZE) -> Counts:
+    """
+    counts the byte values of a file across a pool of processes. Each worker reads its own shards, so none of the
+    file passes through this process.
+    :return: a dictionary {byte value -> count}, in order of first appearance.
+    """
+    if shard_size < 1:
+        raise ValueError(f"The shard size must be at least 1, not {shard_size}.")
+    max_workers = max_workers or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    if size == 0:
+        return {}
+    jobs = [(path, start, min(start + shard_size, size)) for start in range(0, size, shard_size)]
+    if max_workers == 1 or len(jobs) == 1:
+        return merge_counts(_count_file_shard(job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return merge_counts(executor.map(_count_file_shard, jobs))
@@ -0,0 +1,195 @@
+"""
+Benchmarks for PriorityQueue, tree building, encoding and decoding, run through the same entry points users call.
+
+    python -m HuffmanBenchmarkFile run [-o results.json] [--quick] [--repeat N] [--seed S]
+    python -m HuffmanBenchmarkFile compare old.json new.json [--threshold 0.10]
+
+"run" writes the best time of each benchmark (and a throughput in MB/s where that makes sense) as JSON. "compare"
+lines up two such files and flags every benchmark that got slower by more than the threshold; it exits with status 1
+if there are any, so it can gate a CI job. All inputs are generated from a fixed seed, so runs are reproducible.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from PriorityQueueFile import PriorityQueue
+from HuffmanEncoderFile import HuffmanEncoder
+
+DEFAULT_SEED = 12345
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+
+_WORDS = ("the of and to a in is it you that he was for on are with as I his they be at one have this from or had by "
+          "not word but what some we can out other were all there when up use your how said an each she which do "
+          "their time if will way about many then them write would like so these her long make thing see him two "
+          "has look more day could go come did number sound no most people my over know water than call first who "
+          "may down side been now find log error warning request response server client").split()
+
+
+def make_corpus(kind:str, size:int, seed:int) -> str:
+    """
+    makes a reproducible test string of about size characters.
+    :param kind: "uniform" (64 letters, equally likely), "zipfian" (256 letters, Zipf-distributed), "english"
+    (words from a small vocabulary with Zipf-distributed frequencies) or "binary" (skewed random bytes, as latin-1).
+    """
+    rng = random.Random(seed)
+    if kind == "uniform":
+        alphabet = [chr(ord("0") + i) for i in range(64)]
+        return "".join(rng.choices(alphabet, k=size))
+    if kind == "zipfian":
+        alphabet = [chr(i) for i in range(256)]
+        weights = [1 / (rank + 1) for rank in range(256)]
+        return "".join(rng.choices(alphabet, weights=weights, k=size))
+    if kind == "english":
+        weights = [1 / (rank + 1) for rank in range(len(_WORDS))]
+        words:List[str] = []
+        length = 0
+        while length < size:
+            word = rng.choices(_WORDS, weights=weights)[0]
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[:size]
+    if kind == "binary":
+        data = bytes(min(255, int(rng.expovariate(1 / 24))) for i in range(size))
+        return data.decode("latin-1")
+    raise ValueError(f"Unknown corpus kind {kind!r}.")
+
+
+def best_time(function:Callable[[], object], repeat:int) -> float:
+    """
+    runs function repeat times and gives the fastest wall time, in seconds.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_priority_queue(results:Dict[str, Dict], sizes:List[int], repeat:int, seed:int):
+    for size in sizes:
+        rng = random.Random(seed + size)
+        priorities = [rng.randint(0, 1 << 30) for i in range(size)]
+        for is_min_heap in (True, False):
+            def push_pop():
+                queue = PriorityQueue(isMinHeap=is_min_heap)
+                for index, priority in enumerate(priorities):
+                    queue.add_value(index, priority)
+                while not queue.is_empty():
+                    queue.pop()
+            name = f"heap_push_pop/{'min' if is_min_heap else 'max'}/{size}"
+            seconds = best_time(push_pop, repeat)
+            results[name] = {"seconds": seconds, "ops_per_s": 2 * size / seconds}
+
+
+def bench_setup(results:Dict[str, Dict], alphabet_sizes:List[int], length:int, repeat:int, seed:int):
+    for alphabet_size in alphabet_sizes:
+        rng = random.Random(seed + alphabet_size)
+        # skip the surrogate range, which can't be printed
+        alphabet = [chr(0x100 + i) if i < 0xD700 else chr(0x3100 + i) for i in range(alphabet_size)]
+        text = "".join(alphabet) + "".join(rng.choices(alphabet, k=length))
+        for construction in ("heap", "two_queue"):
+            def setup():
+                HuffmanEncoder(text, construction=construction).do_setup()
+            seconds = best_time(setup, repeat)
+            results[f"do_setup/{construction}/{alphabet_size}"] = {"seconds": seconds}
+
+
+def bench_codec(results:Dict[str, Dict], kinds:List[str], size:int, repeat:int, seed:int):
+    for kind in kinds:
+        text = make_corpus(kind, size, seed)
+        encoder = HuffmanEncoder(text)
+        encoder.do_setup()
+        megabytes = len(text.encode("utf-8")) / 1e6
+        packed, bit_length = encoder.encode_message_packed(text)
+        if encoder.decode_message_packed(packed, bit_length) != text:
+            raise RuntimeError(f"The {kind} corpus did not survive an encode/decode round trip.")
+
+        seconds = best_time(lambda: encoder.encode_message_packed(text), repeat)
+        results[f"encode_packed/{kind}"] = {"seconds": seconds, "mb_per_s": megabytes / seconds,
+                                            "bits_per_symbol": bit_length / len(text)}
+        seconds = best_time(lambda: encoder.decode_message_packed(packed, bit_length), repeat)
+        results[f"decode_packed/{kind}"] = {"seconds": seconds, "mb_per_s": megabytes / seconds}
+
+        bits = encoder.encode_message(text)
+        seconds = best_time(lambda: encoder.encode_message(text), repeat)
+        results[f"encode_message/{kind}"] = {"seconds": seconds, "mb_per_s": megabytes / seconds}
+        seconds = best_time(lambda: encoder.decode_message(bits), repeat)
+        results[f"decode_message/{kind}"] = {"seconds": seconds, "mb_per_s": megabytes / seconds}
+
+
+def run(quick:bool=False, repeat:int=DEFAULT_REPEAT, seed:int=DEFAULT_SEED) -> Dict:
+    """
+    runs every benchmark.
+    :param quick: use small inputs, for a fast smoke test.
+    :return: {"meta": {...}, "results": {benchmark name -> {"seconds": ..., ...}}}
+    """
+    results:Dict[str, Dict] = {}
+    bench_priority_queue(results, [1000, 10000] if quick else [1000, 10000, 100000], repeat, seed)
+    bench_setup(results, [16, 256] if quick else [16, 256, 4096, 65536], 10000 if quick else 200000, repeat, seed)
+    bench_codec(results, ["uniform", "zipfian", "english", "binary"], 20000 if quick else 1000000, repeat, seed)
+    meta = {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "platform": platform.platform(), "seed": seed, "repeat": repeat,
+            "quick": quick, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def compare(old:Dict, new:Dict, threshold:float=DEFAULT_THRESHOLD) -> List[str]:
+    """
+    compares two results from run().
+    :return: a line for every benchmark that slowed down by more than threshold (e.g. 0.10 for 10%).
+    """
+    regressions:List[str] = []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        old_seconds = old["results"][name]["seconds"]
+        new_seconds = new["results"][name]["seconds"]
+        change = (new_seconds - old_seconds) / old_seconds
+        line = f"{name:40} {old_seconds:10.4f}s -> {new_seconds:10.4f}s  {change:+7.1%}"
+        print(line + ("  REGRESSION" if change > threshold else ""))
+        if change > threshold:
+            regressions.append(line)
+    for name in sorted(set(old["results"]) ^ set(new["results"])):
+        print(f"{name:40} only in {'old' if name in old['results'] else 'new'} results")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m HuffmanBenchmarkFile", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", default="-", help="JSON file to write (default: stdout)")
+    run_parser.add_argument("--quick", action="store_true", help="small inputs, for a smoke test")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per benchmark; the best counts")
+    run_parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help=f"slowdown that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        output = json.dumps(run(args.quick, args.repeat, args.seed), indent=2)
+        if args.output == "-":
+            print(output)
+        else:
+            with open(args.output, "w") as file:
+                file.write(output + "\n")
+    else:
+        with open(args.old) as file:
+            old = json.load(file)
+        with open(args.new) as file:
+            new = json.load(file)
+        regressions = compare(old, new, args.threshold)
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Block-parallel compression with HuffmanEncoder.
+
+The input is split into independent blocks, and each block is compressed with its own canonical code on a
+ProcessPoolExecutor. An index at the end of the file records where every block starts, so decompression can also
+run in parallel, and any single block can be decoded without reading the others.
+
+    python -m HuffmanBlockFile compress   input -o output [--block-size N] [-j WORKERS]
+    python -m HuffmanBlockFile decompress input -o output [-j WORKERS] [--block I]
+
+File format:
+    MAGIC
+    the blocks, each: canonical code-length header, varint symbol_count, varint bit_length, packed bits
+    the index: for each block, (offset, compressed size, original size) as little-endian unsigned 64-bit ints
+    the trailer: block count and index offset as little-endian unsigned 64-bit ints, then MAGIC again
+"""
+import argparse
+import contextlib
+import os
+import struct
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, List, Tuple
+
+from HuffmanEncoderFile import HuffmanEncoder
+from HuffmanStreamFile import build_stream_encoder, read_chunks
+from BitStreamFile import BitWriter
+from CanonicalCodeFile import write_varint, read_varint, parse_code_lengths
+from ExecutorHelpersFile import in_order
+
+MAGIC = b"HUFB"
+DEFAULT_BLOCK_SIZE = 1 << 22
+_INDEX_ENTRY = struct.Struct("<QQQ")
+_TRAILER = struct.Struct("<QQ4s")
+
+# (offset of the block in the file, compressed size, original size)
+BlockIndexEntry = Tuple[int, int, int]
+
+
+def encode_block(block:bytes) -> bytes:
+    """
+    compresses one block with its own canonical code. Runs in a worker process.
+    """
+    encoder = build_stream_encoder(dict(Counter(block)))
+    writer = BitWriter()
+    writer.write_symbols(block, encoder.code_table)
+    result = bytearray(encoder.get_header())
+    write_varint(result, len(block))
+    write_varint(result, writer.bit_length)
+    result += writer.getvalue()
+    return bytes(result)
+
+
+def decode_block(data) -> bytes:
+    """
+    decompresses one block made by encode_block. Runs in a worker process.
+    :param data: bytes or any other buffer-protocol object holding exactly one block.
+    """
+    data = memoryview(data).cast("B")
+    lengths, offset = parse_code_lengths(data)
+    symbol_count, offset = read_varint(data, offset)
+    bit_length, offset = read_varint(data, offset)
+    decoder = HuffmanEncoder.from_code_lengths(lengths)
+    if decoder.decode_table.max_length == 0:
+        # only one byte value in the block, so its code is empty.
+        return bytes([next(iter(lengths))]) * symbol_count
+    symbols = decoder.decode_table.decode_symbols(data[offset:], bit_length)
+    if len(symbols) != symbol_count:
+        raise ValueError(f"A block decoded to {len(symbols)} bytes instead of {symbol_count}.")
+    return bytes(symbols)
+
+
+def compress_blocks(source:BinaryIO, destination:BinaryIO, block_size:int=DEFAULT_BLOCK_SIZE,
+                    max_workers:int=None) -> List[BlockIndexEntry]:
+    """
+    compresses everything left in source into destination, one block per worker at a time.
+    :return: the block index that was written.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    index:List[BlockIndexEntry] = []
+    destination.write(MAGIC)
+    offset = len(MAGIC)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        blocks = read_chunks(source, block_size)
+        for original_size, compressed in in_order(executor, _encode_sized_block, blocks, 2 * max_workers):
+            destination.write(compressed)
+            index.append((offset, len(compressed), original_size))
+            offset += len(compressed)
+    for entry in index:
+        destination.write(_INDEX_ENTRY.pack(*entry))
+    destination.write(_TRAILER.pack(len(index), offset, MAGIC))
+    return index
+
+
+def _encode_sized_block(block:bytes) -> Tuple[int, bytes]:
+    return len(block), encode_block(block)
+
+
+def read_block_index(source:BinaryIO) -> List[BlockIndexEntry]:
+    """
+    reads the block index from the end of a seekable file made by compress_blocks.
+    """
+    source.seek(-_TRAILER.size, os.SEEK_END)
+    block_count, index_offset, magic = _TRAILER.unpack(source.read(_TRAILER.size))
+    if magic != MAGIC:
+        raise ValueError("This is not a HuffmanBlockFile compressed file.")
+    source.seek(index_offset)
+    data = source.read(block_count * _INDEX_ENTRY.size)
+    if len(data) != block_count * _INDEX_ENTRY.size:
+        raise ValueError("The block index is cut short.")
+    return [_INDEX_ENTRY.unpack_from(data, i * _INDEX_ENTRY.size) for i in range(block_count)]
+
+
+def _read_block(source:BinaryIO, entry:BlockIndexEntry) -> bytes:
+    offset, compressed_size, original_size = entry
+    source.seek(offset)
+    data = source.read(compressed_size)
+    if len(data) != compressed_size:
+        raise ValueError(f"The block at offset {offset} is cut short.")
+    return data
+
+
+def decompress_block_at(source:BinaryIO, block_number:int, index:List[BlockIndexEntry]=None) -> bytes:
+    """
+    decodes just one block of a file made by compress_blocks, without touching the others.
+    :param index: the file's block index, if it has already been read.
+    """
+    if index is None:
+        index = read_block_index(source)
+    if block_number < 0 or block_number >= len(index):
+        raise IndexError(f"Block {block_number} is out of bounds for a file of {len(index)} blocks.")
+    return decode_block(_read_block(source, index[block_number]))
+
+
+def decompress_blocks(source:BinaryIO, destination:BinaryIO, max_workers:int=None):
+    """
+    decompresses a seekable file made by compress_blocks into destination, decoding blocks in parallel.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    index = read_block_index(source)
+    blocks = (_read_block(source, entry) for entry in index)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for block in in_order(executor, decode_block, blocks, 2 * max_workers):
+            destination.write(block)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m HuffmanBlockFile",
+                                     description="Huffman-compress or decompress a file in parallel blocks.")
+    parser.add_argument("mode", choices=["compress", "decompress"])
+    parser.add_argument("input", help="file to read ('-' for stdin when compressing)")
+    parser.add_argument("-o", "--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help=f"bytes per block (default: {DEFAULT_BLOCK_SIZE})")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--block", type=int, default=None, help="when decompressing, only decode this block")
+    args = parser.parse_args(argv)
+    if args.block_size < 1:
+        parser.error("--block-size must be at least 1")
+
+    with contextlib.ExitStack() as stack:
+        destination = sys.stdout.buffer if args.output == "-" else stack.enter_context(open(args.output, "wb"))
+        if args.mode == "compress":
+            source = sys.stdin.buffer if args.input == "-" else stack.enter_context(open(args.input, "rb"))
+            compress_blocks(source, destination, args.block_size, args.workers)
+        else:
+            if args.input == "-":
+                parser.error("decompress needs a seekable input file, not stdin")
+            source = stack.enter_context(open(args.input, "rb"))
+            if args.block is not None:
+                index = read_block_index(source)
+                if args.block < 0 or args.block >= len(index):
+                    parser.error(f"--block {args.block} is out of range; the file has {len(index)} blocks")
+                destination.write(decompress_block_at(source, args.block, index))
+            else:
+                decompress_blocks(source, destination, args.workers)
+        destination.flush()
+
+
+if __name__ == "__main__":
+    main()
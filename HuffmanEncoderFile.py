@@ -1,17 +1,129 @@
 from PriorityQueueFile import PriorityQueue
 from TreeNodesFile import *
-from typing import Dict, List
+from FlatTreeFile import FlatTree
+from DecodeTableFile import DecodeTable, CodeTable, code_table_from_tree
+from BitStreamFile import BitWriter, pack_bits, unpack_bits
+from CanonicalCodeFile import canonical_codes, code_lengths_from_tree, tree_from_code_table, \
+    serialize_code_lengths, parse_code_lengths
+from LengthLimitedCodeFile import package_merge_code_lengths, encoded_bit_count
+from InstrumentationFile import Metrics, NO_PHASE
+from collections import Counter, deque
+from typing import Dict, List, Tuple
+
+# the ways build_tree can be done: "heap" merges through a PriorityQueue in O(n log n); "two_queue" sorts the leaves
+# once and then merges with two FIFO queues in O(n).
+TREE_CONSTRUCTIONS = ("heap", "two_queue")
 
 class HuffmanEncoder():
-    def __init__(self, stringToEncode=""):
+    def __init__(self, stringToEncode="", canonical:bool=False, construction:str="heap", max_code_length:int=None,
+                 flat_tree:bool=False, metrics:Metrics=None):
+        """
+        :param stringToEncode: the string whose letter counts decide the shape of the tree.
+        :param canonical: if True, keep only the code lengths from the Huffman tree and assign the codes canonically,
+        so the whole code can be shipped as a small header (see get_header() and from_header()).
+        :param construction: how to build the tree - one of TREE_CONSTRUCTIONS.
+        :param max_code_length: if given, no code will be longer than this many bits (e.g. 12 or 15). The tree is
+        replaced by the best one that obeys the limit; see limit_code_lengths().
+        :param flat_tree: if True, self.encoding_tree is built directly as a FlatTree (parallel arrays of node ids)
+        instead of a graph of JointNode/LeafNode objects.
+        :param metrics: if given, records the time taken by each phase of setup, encoding and decoding, and counts
+        such as heap operations, tree nodes made and bits emitted. Without one, nothing is measured or printed.
+        """
+        if construction not in TREE_CONSTRUCTIONS:
+            raise ValueError(f"Unknown tree construction {construction!r}; choose one of {TREE_CONSTRUCTIONS}.")
         self.encode_string = stringToEncode
+        self.canonical = canonical
+        self.construction = construction
+        self.max_code_length = max_code_length
+        self.flat_tree = flat_tree
+        self.metrics = metrics
+        # (bits without the limit, bits with it, fraction of extra output), filled in by limit_code_lengths().
+        self.length_limit_cost:Tuple[int, int, float] = None
         self.encode_dictionary:Dict[str,List[int]] = {}
+        self.encoding_tree:TreeNode[str] = None  # stays None for encoders made from a header
+        self.code_table:CodeTable = None
+        self.decode_table:DecodeTable = None
+
+    def phase(self, name:str):
+        """
+        a context manager that times the code inside it as the named phase, if this encoder has metrics.
+        """
+        if self.metrics is None:
+            return NO_PHASE
+        return self.metrics.phase(name)
+
+    def count(self, name:str, amount:int=1):
+        if self.metrics is not None:
+            self.metrics.count(name, amount)
 
     def do_setup(self):
-        self.build_frequency_dictionary()
-        self.build_priority_queue()
-        self.build_tree()
-        self.build_encode_dictionary_with_tree(self.encoding_tree)
+        with self.phase("frequencies"):
+            self.build_frequency_dictionary()
+        self.do_setup_from_frequencies()
+
+    def do_setup_from_frequencies(self):
+        """
+        the part of do_setup that comes after counting: builds the tree and tables from self.freq_dict, which may have
+        been filled in by the caller (e.g. from a counting pass over a file too big to hold in one string).
+        """
+        if self.construction == "two_queue":
+            with self.phase("tree"):
+                self.build_tree_with_two_queues()
+        else:
+            with self.phase("priority_queue"):
+                self.build_priority_queue()
+            with self.phase("tree"):
+                self.build_tree()
+        if self.max_code_length is not None:
+            with self.phase("length_limit"):
+                self.limit_code_lengths()
+        if self.canonical:
+            with self.phase("canonical"):
+                self.make_tree_canonical()
+        with self.phase("encode_dictionary"):
+            self.build_encode_dictionary_with_tree(self.encoding_tree)
+        with self.phase("code_table"):
+            self.build_code_table()
+        with self.phase("decode_table"):
+            self.build_decode_table()
+
+    @classmethod
+    def from_frequencies(cls, frequencies:Dict[str,int], **options) -> "HuffmanEncoder":
+        """
+        builds an encoder from letter counts made elsewhere (e.g. by FrequencyCountFile.count_frequencies), without a
+        string to count. The tree only depends on the counts and their order, so counts equal to what
+        build_frequency_dictionary would make give the same tree.
+        :param frequencies: a dictionary {letter -> count}, with every count at least 1.
+        :param options: passed to HuffmanEncoder (canonical=..., construction=..., and so on).
+        """
+        for letter, count in frequencies.items():
+            if count < 1:
+                raise ValueError(f"The letter {letter!r} has a count of {count}; every count must be at least 1.")
+        encoder = cls(**options)
+        encoder.freq_dict = dict(frequencies)
+        encoder.do_setup_from_frequencies()
+        return encoder
+
+    @classmethod
+    def from_header(cls, header, offset:int=0) -> "HuffmanEncoder":
+        """
+        makes an encoder/decoder from a header made by get_header(). Only the code and decode tables are rebuilt -
+        there is no encoding_tree, so decode_message_with_tree cannot be used.
+        :param header: bytes or any other buffer-protocol object.
+        :param offset: where the header starts in header.
+        """
+        lengths, _ = parse_code_lengths(header, offset)
+        return cls.from_code_lengths(lengths)
+
+    @classmethod
+    def from_code_lengths(cls, lengths:Dict[str,int]) -> "HuffmanEncoder":
+        """
+        makes a canonical encoder/decoder from a dictionary {symbol -> code_length}, without building a tree.
+        """
+        encoder = cls(canonical=True)
+        encoder.code_table = canonical_codes(lengths)
+        encoder.build_decode_table()
+        return encoder
 
     def build_frequency_dictionary(self):
         """
@@ -19,14 +131,9 @@ class HuffmanEncoder():
         keys, and the number of times they appear are the values.
         For instance, "red beret" would lead to a dictionary {"r":2, "e":3, "d":1, " ":1, "b":1, "t":1}
         """
-        self.freq_dict:Dict[str,int] = {}
-        for character in self.encode_string:
-            if character in self.freq_dict:
-                self.freq_dict[character] += 1
-            else:
-                self.freq_dict[character] = 1
-
-            ## ----------------------------------------
+        # Counter does the same counting loop in C; like the dictionary it replaces, it keeps the letters in order
+        # of first appearance, which decides how build_tree breaks ties.
+        self.freq_dict:Dict[str,int] = dict(Counter(self.encode_string))
 
     def build_priority_queue(self):
         """
@@ -36,13 +143,16 @@ class HuffmanEncoder():
         (That is, you'll need to make a new LeafNode[str] for each item in self.freq_dict and add it to the PQ.)
 
         """
-        print(self.encode_string)
-        self.frequency_queue:PriorityQueue[TreeNode[str]] = PriorityQueue[TreeNode[T]] (isMinHeap=True)
         # ----------------------
-        for letter in self.freq_dict.keys():
-            n:LeafNode[str] = LeafNode[str](letter)
-            self.frequency_queue.add_value(n, self.freq_dict[letter])
-        print(self.frequency_queue)
+        # building the heap in one go is O(n), rather than O(n log n) for adding the leaves one at a time.
+        # Priorities are (count, sequence number): leaves are numbered in freq_dict order and each JointNode after
+        # all of them, in the order it is made. So ties go to leaves before JointNodes, and older before newer -
+        # the same order build_tree_with_two_queues takes them in, so both build the same tree.
+        self.start_tree()
+        leaves = [((self.freq_dict[letter], sequence), self.make_leaf(letter))
+                  for sequence, letter in enumerate(self.freq_dict.keys())]
+        self.frequency_queue:PriorityQueue[TreeNode[str]] = PriorityQueue[TreeNode[T]] (leaves, isMinHeap=True)
+        self.count("heap_operations", len(leaves))  # heapify places each leaf once
 
         # ----------------------
 
@@ -62,16 +172,90 @@ class HuffmanEncoder():
 
         # suggestion: each time through your loop, print out the
         # priority queue to help you debug.
+        sequence = len(self.frequency_queue)  # JointNodes are numbered after the leaves
         while len(self.frequency_queue) >= 2:
             l1:TreeNode[T] = self.frequency_queue.pop()
-            l2:TreeNode[T] = self.frequency_queue.pop()
-            j1:JointNode[T] = JointNode[T](l1[1],l2[1])
-            self.frequency_queue.add_value(j1,l1[0]+l2[0])
+            l2:TreeNode[T] = self.frequency_queue.peek()
+            j1:JointNode[T] = self.make_joint(l1[1],l2[1])
+            # the second node is swapped for the new JointNode in one sift, instead of a pop and an add_value.
+            self.frequency_queue.replace(j1,(l1[0][0]+l2[0][0], sequence))
+            sequence += 1
+            self.count("heap_operations", 2)
 
         # ----------------------
 
         last_PQ_Node = self.frequency_queue.pop()
-        self.encoding_tree:TreeNode[str] = last_PQ_Node[1]
+        self.count("heap_operations")
+        self.encoding_tree:TreeNode[str] = self.finish_tree(last_PQ_Node[1])
+
+    def build_tree_with_two_queues(self):
+        """
+        Builds the same kind of Huffman tree as build_tree, in linear time after one sort, without a priority queue.
+        The leaves are sorted by count into one FIFO queue; the JointNodes go into a second FIFO queue, and since
+        each new JointNode weighs at least as much as the one before it, that queue is sorted too. So the two
+        lowest-count nodes are always at the fronts of the two queues. (On ties, the leaf goes first.)
+        build_tree breaks ties in the same order, so the two give exactly the same tree and code lengths.
+        """
+        if len(self.freq_dict) == 0:
+            raise IndexError("Cannot build a tree without any letters.")
+        self.start_tree()
+        leaves = deque(sorted(((count, self.make_leaf(letter)) for letter, count in self.freq_dict.items()),
+                              key=lambda pair: pair[0]))
+        joints:deque = deque()
+
+        def take_lowest():
+            if len(joints) == 0 or (len(leaves) > 0 and leaves[0][0] <= joints[0][0]):
+                return leaves.popleft()
+            return joints.popleft()
+
+        while len(leaves) + len(joints) >= 2:
+            l1 = take_lowest()
+            l2 = take_lowest()
+            joints.append((l1[0] + l2[0], self.make_joint(l1[1], l2[1])))
+        self.encoding_tree:TreeNode[str] = self.finish_tree((leaves or joints)[0][1])
+
+    def start_tree(self):
+        """
+        gets ready for make_leaf and make_joint to build a new tree.
+        """
+        self.tree_under_construction:FlatTree = FlatTree() if self.flat_tree else None
+
+    def make_leaf(self, letter:str):
+        """
+        makes a new leaf: a LeafNode, or in flat_tree mode, the node id of a new leaf in the FlatTree.
+        """
+        if self.flat_tree:
+            return self.tree_under_construction.add_leaf(letter)
+        return LeafNode[str](letter)
+
+    def make_joint(self, left, right):
+        """
+        joins two subtrees made by make_leaf/make_joint: a JointNode, or in flat_tree mode, a new node id.
+        """
+        if self.flat_tree:
+            return self.tree_under_construction.add_joint(left, right)
+        return JointNode[T](left, right)
+
+    def finish_tree(self, root):
+        """
+        gives the finished tree whose root was made by make_leaf/make_joint.
+        """
+        self.count("tree_nodes", 2 * len(self.freq_dict) - 1)
+        if self.flat_tree:
+            tree = self.tree_under_construction
+            tree.root = root
+            self.tree_under_construction = None
+            return tree
+        return root
+
+    def tree_from_code_table(self, codes:CodeTable):
+        """
+        builds the tree (of whichever kind this encoder uses) whose paths are the given codes.
+        """
+        self.count("tree_nodes", 2 * len(codes) - 1)
+        if self.flat_tree:
+            return FlatTree.from_code_table(codes)
+        return tree_from_code_table(codes)
 
     def build_encode_dictionary_with_tree(self, root:TreeNode[str]=None, pathSoFar:List[int]=[]):
         """
@@ -88,6 +272,11 @@ class HuffmanEncoder():
             root = self.encoding_tree  # ok to do, because we would only go left or right recursively if there is a left
                                         # and right, so this must be the real root node.
 
+        if isinstance(root, FlatTree):  # a FlatTree is walked without recursion, and each path is made only once.
+            for letter, (code, length) in root.code_table().items():
+                self.encode_dictionary[letter] = [(code >> shift) & 1 for shift in range(length - 1, -1, -1)]
+            return
+
         if isinstance(root,JointNode): #is this node a joint node?
             left_list = pathSoFar[:]  # makes a copy
             left_list.append(0)
@@ -98,39 +287,126 @@ class HuffmanEncoder():
 
         else:  #then this must be a leaf node.... Note that this is the only time we actually add anything to the dictionary.
             self.encode_dictionary[root.value] = pathSoFar
-            print(" ")
-            print(root.value)
-            print(pathSoFar)
+
+    def limit_code_lengths(self):
+        """
+        makes sure that no code in self.encoding_tree is longer than self.max_code_length bits. If the tree is too
+        deep, it is replaced by the tree of the optimal length-limited code (found by package-merge), with canonical
+        codes. Either way, records in self.length_limit_cost how many bits the whole message takes with and without
+        the limit, and the fraction of extra output the limit costs.
+        """
+        lengths = code_lengths_from_tree(self.encoding_tree)
+        unlimited_bits = encoded_bit_count(self.freq_dict, lengths)
+        if max(lengths.values()) > self.max_code_length:
+            lengths = package_merge_code_lengths(self.freq_dict, self.max_code_length)
+            self.encoding_tree = self.tree_from_code_table(canonical_codes(lengths))
+        limited_bits = encoded_bit_count(self.freq_dict, lengths)
+        extra = (limited_bits - unlimited_bits) / unlimited_bits if unlimited_bits > 0 else 0.0
+        self.length_limit_cost = (unlimited_bits, limited_bits, extra)
+
+    def make_tree_canonical(self):
+        """
+        replaces self.encoding_tree with the tree of the canonical code that has the same code lengths.
+        """
+        self.encoding_tree = self.tree_from_code_table(canonical_codes(code_lengths_from_tree(self.encoding_tree)))
+
+    def get_header(self) -> bytes:
+        """
+        gives a compact header holding each symbol's code length, from which from_header() can rebuild the code.
+        Only available in canonical mode, since other codes cannot be rebuilt from their lengths.
+        """
+        if not self.canonical:
+            raise RuntimeError("Headers can only be made for canonical codes. Use HuffmanEncoder(..., canonical=True).")
+        if self.code_table is None:
+            self.build_code_table()
+        return serialize_code_lengths({symbol: length for symbol, (code, length) in self.code_table.items()})
+
+    def build_code_table(self):
+        """
+        builds self.code_table, a dictionary {str -> (code, code_length)} holding the same paths as
+        self.encode_dictionary, but with each path packed into one int so it can be written to a BitWriter in one step.
+        """
+        self.code_table = code_table_from_tree(self.encoding_tree)
+
+    def build_decode_table(self):
+        """
+        precomputes the lookup tables (self.decode_table) that let decode_message find each symbol with one table probe
+        instead of walking self.encoding_tree a bit at a time.
+        """
+        if self.code_table is None:
+            self.build_code_table()
+        self.decode_table = DecodeTable(self.code_table)
+
+    def encode_message_packed(self, messageToEncode:str) -> Tuple[bytearray, int]:
+        """
+        Converts each letter into its code and packs all the bits into a bytearray, most significant bit first.
+        :param messageToEncode: a string, all of whose characters should be contained in the encoding tree.
+        :return: (the packed bits, the number of bits). The last byte is padded with (-bit_length % 8) zeros.
+        raises a KeyError if a letter is not in the encoding tree.
+        """
+        if self.code_table is None:
+            self.build_code_table()
+        with self.phase("encode"):
+            writer = BitWriter()
+            writer.write_symbols(messageToEncode, self.code_table)
+            packed = writer.getvalue()
+        if self.metrics is not None:
+            self.metrics.count("symbols_encoded", len(messageToEncode))
+            self.metrics.count("bits_emitted", writer.bit_length)
+        return packed, writer.bit_length
+
+    def decode_message_packed(self, messageToDecode, bit_length:int) -> str:
+        """
+        Uses the lookup tables in self.decode_table to convert packed bits back into the original string.
+        :param messageToDecode: bytes, bytearray, memoryview or any other buffer-protocol object, as made by
+        encode_message_packed.
+        :param bit_length: the number of bits in messageToDecode that are not padding.
+        :return: the decoded string.
+        """
+        if self.decode_table is None:
+            self.build_decode_table()
+        with self.phase("decode"):
+            symbols = self.decode_table.decode_symbols(messageToDecode, bit_length)
+            result = "".join(symbols)
+        if self.metrics is not None:
+            self.metrics.count("bits_consumed", bit_length)
+            self.metrics.count("symbols_decoded", len(symbols))
+        return result
 
     def encode_message(self, messageToEncode:str) -> List[int]:
         """
         Use the self.encodingDictionary to convert each letter into a sequence of 1's and 0's (bits),
         and generate a (very) long array of bits, which you should return.
+        (This is a wrapper around encode_message_packed, which uses far less memory.)
         :param messageToEncode: a string, all of whose characters should be contained in the encoding tree.
         :return: a (very long) list of ones and zeros.
         """
-        encoded_result:List[int] = []
-        # ----------------------
-        i=0
-        for char in messageToEncode:
-            # print(char)
-            # print(type(encoded_result))
-            # print(type(self.encode_dictionary[char]))
-            encoded_result.extend(self.encode_dictionary[char])
-            # print(encoded_result)
-            i+=1
-            # if there is a problem, you should throw the following.
-            #raise new KeyError(f"The letter \'{char}\' was not contained in the key string.")
-        return encoded_result
+        packed, bit_length = self.encode_message_packed(messageToEncode)
+        return unpack_bits(packed, bit_length)
 
     def decode_message(self, messageToDecode:List[int])-> str:
         """
-        :param messageToDecode:
-        :return:
+        Converts a list of bits back into the original string.
+        (This is a wrapper around decode_message_packed.)
+        :param messageToDecode: a list of ones and zeros, as made by encode_message.
+        :return: the decoded string.
+        """
+        return self.decode_message_packed(pack_bits(messageToDecode), len(messageToDecode))
+
+    def decode_message_with_tree(self, messageToDecode:List[int])-> str:
+        """
+        The reference decoder: walks self.encoding_tree one bit at a time. Much slower than decode_message, but
+        useful for cross-checking it.
+        :param messageToDecode: a list of ones and zeros, as made by encode_message.
+        :return: the decoded string.
+        raises a ValueError if this encoder has no tree (e.g. it was made by from_header).
         """
+        if self.encoding_tree is None:
+            raise ValueError("This encoder has no encoding tree to walk; it was made from code lengths only.")
+        if isinstance(self.encoding_tree, FlatTree):
+            return "".join(self.encoding_tree.decode_bit_list(messageToDecode))
         decoded_result = ""
         p = self.encoding_tree
-        p.print_tree()
         index = 0
         while index < len(messageToDecode):
             while isinstance(p, JointNode):
@@ -0,0 +1,211 @@
+"""
+Streaming compression of files (or stdin/stdout) with HuffmanEncoder, in constant memory.
+
+    python -m HuffmanStreamFile compress   [input] [-o output]
+    python -m HuffmanStreamFile decompress [input] [-o output]
+
+The symbols are the bytes of the input. The input is read twice - once to count the bytes, once to encode them - a
+chunk at a time, so memory use depends on the chunk size, not the size of the input. Input that cannot be rewound
+(a pipe or stdin) is copied to a temporary file during the counting pass.
+
+File format:
+    MAGIC
+    canonical code-length header (see CanonicalCodeFile.serialize_code_lengths)
+    any number of chunks, each: varint symbol_count, varint bit_length, ceil(bit_length / 8) bytes of packed bits
+    a final varint 0 (a chunk with no symbols)
+"""
+import argparse
+import contextlib
+import sys
+import tempfile
+from collections import Counter
+from typing import BinaryIO, Dict, Iterator
+
+from HuffmanEncoderFile import HuffmanEncoder
+from BitStreamFile import BitWriter
+from DecodeTableFile import CodeTable
+from CanonicalCodeFile import write_varint, parse_code_lengths
+
+MAGIC = b"HUF1"
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def read_chunks(source:BinaryIO, chunk_size:int=DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    yields the rest of source, chunk_size bytes at a time.
+    """
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def count_symbols(source:BinaryIO, chunk_size:int=DEFAULT_CHUNK_SIZE, copy_to:BinaryIO=None) -> Dict[int, int]:
+    """
+    counts how many times each byte value appears in the rest of source, in one pass.
+    :param copy_to: if given, every chunk is also written here (so a stream that can't be rewound can be read again).
+    :return: a dictionary {byte value -> count}
+    """
+    counts:Counter = Counter()
+    for chunk in read_chunks(source, chunk_size):
+        counts.update(chunk)
+        if copy_to is not None:
+            copy_to.write(chunk)
+    return dict(counts)
+
+
+def build_stream_encoder(counts:Dict[int, int]) -> HuffmanEncoder:
+    """
+    makes a canonical HuffmanEncoder for the given byte counts.
+    """
+    return HuffmanEncoder.from_frequencies(counts, canonical=True)
+
+
+def encode_record(chunk:bytes, code_table:CodeTable) -> bytes:
+    """
+    encodes one chunk as a chunk record: varint symbol_count, varint bit_length, packed bits.
+    """
+    writer = BitWriter()
+    writer.write_symbols(chunk, code_table)
+    record = bytearray()
+    write_varint(record, len(chunk))
+    write_varint(record, writer.bit_length)
+    record += writer.getvalue()
+    return bytes(record)
+
+
+def decode_record(decoder:HuffmanEncoder, data:bytes, bit_length:int, symbol_count:int) -> bytes:
+    """
+    decodes the packed bits of one chunk record.
+    :param decoder: the encoder rebuilt from the stream's header.
+    """
+    if decoder.decode_table.max_length == 0:
+        # only one byte value in the whole input, so its code is empty.
+        symbols = [next(iter(decoder.code_table))] * symbol_count
+    else:
+        symbols = decoder.decode_table.decode_symbols(data, bit_length)
+    if len(symbols) != symbol_count:
+        raise ValueError(f"A chunk decoded to {len(symbols)} bytes instead of {symbol_count}.")
+    return bytes(symbols)
+
+
+def encode_chunks(source:BinaryIO, encoder:HuffmanEncoder, chunk_size:int=DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    yields the encoded form of the rest of source, one chunk record at a time (without the header or end marker).
+    """
+    for chunk in read_chunks(source, chunk_size):
+        yield encode_record(chunk, encoder.code_table)
+
+
+def _read_exactly(source:BinaryIO, size:int) -> bytes:
+    data = source.read(size)
+    if len(data) != size:
+        raise ValueError(f"The compressed stream ended early: wanted {size} bytes, got {len(data)}.")
+    return data
+
+
+def _read_stream_varint(source:BinaryIO) -> int:
+    number = 0
+    shift = 0
+    while True:
+        byte = _read_exactly(source, 1)[0]
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number
+        shift += 7
+
+
+def _read_stream_header(source:BinaryIO) -> Dict[int, int]:
+    """
+    reads the code-length header one varint at a time, so that nothing after it is consumed.
+    """
+    header = bytearray(_read_exactly(source, 1))
+    count = _read_stream_varint(source)
+    write_varint(header, count)
+    for i in range(count):
+        write_varint(header, _read_stream_varint(source))
+        header += _read_exactly(source, 1)
+    lengths, _ = parse_code_lengths(header)
+    return lengths
+
+
+def decode_chunks(source:BinaryIO) -> Iterator[bytes]:
+    """
+    reads a compressed stream (made by compress_stream) and yields the original bytes, one chunk at a time.
+    """
+    if _read_exactly(source, len(MAGIC)) != MAGIC:
+        raise ValueError("This is not a HuffmanStreamFile compressed stream.")
+    lengths = _read_stream_header(source)
+    decoder = HuffmanEncoder.from_code_lengths(lengths) if len(lengths) > 0 else None
+    while True:
+        symbol_count = _read_stream_varint(source)
+        if symbol_count == 0:
+            return
+        bit_length = _read_stream_varint(source)
+        data = _read_exactly(source, -(-bit_length // 8))
+        if decoder is None:
+            raise ValueError("The compressed stream has data but no code.")
+        yield decode_record(decoder, data, bit_length, symbol_count)
+
+
+def compress_stream(source:BinaryIO, destination:BinaryIO, chunk_size:int=DEFAULT_CHUNK_SIZE):
+    """
+    compresses everything left in source into destination.
+    """
+    if source.seekable():
+        start = source.tell()
+        counts = count_symbols(source, chunk_size)
+        source.seek(start)
+        _compress_counted(source, destination, counts, chunk_size)
+    else:
+        with tempfile.TemporaryFile() as spool:
+            counts = count_symbols(source, chunk_size, copy_to=spool)
+            spool.seek(0)
+            _compress_counted(spool, destination, counts, chunk_size)
+
+
+def _compress_counted(source:BinaryIO, destination:BinaryIO, counts:Dict[int, int], chunk_size:int):
+    destination.write(MAGIC)
+    if len(counts) == 0:
+        destination.write(bytes([0, 0]))  # an empty header (kind 0, no symbols) ...
+    else:
+        encoder = build_stream_encoder(counts)
+        destination.write(encoder.get_header())
+        for piece in encode_chunks(source, encoder, chunk_size):
+            destination.write(piece)
+    destination.write(bytes([0]))  # ... and the end marker.
+
+
+def decompress_stream(source:BinaryIO, destination:BinaryIO):
+    """
+    decompresses a stream made by compress_stream from source into destination.
+    """
+    for piece in decode_chunks(source):
+        destination.write(piece)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m HuffmanStreamFile",
+                                     description="Huffman-compress or decompress a file, or stdin to stdout.")
+    parser.add_argument("mode", choices=["compress", "decompress"])
+    parser.add_argument("input", nargs="?", default="-", help="file to read (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"bytes to encode at a time (default: {DEFAULT_CHUNK_SIZE})")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    with contextlib.ExitStack() as stack:
+        source = sys.stdin.buffer if args.input == "-" else stack.enter_context(open(args.input, "rb"))
+        destination = sys.stdout.buffer if args.output == "-" else stack.enter_context(open(args.output, "wb"))
+        if args.mode == "compress":
+            compress_stream(source, destination, args.chunk_size)
+        else:
+            decompress_stream(source, destination)
+        destination.flush()
+
+
+if __name__ == "__main__":
+    main()
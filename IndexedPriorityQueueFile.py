@@ -0,0 +1,209 @@
+from PriorityQueueFile import PriorityQueue, T
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+
+class IndexedPriorityQueue (PriorityQueue[T]):
+    """
+    A PriorityQueue whose items can be found again after they are added. Each item has a handle (by default, the value
+    itself), and the queue keeps a map from handle to position in my_tree, updated whenever heapify_up or
+    heapify_down moves a node. That lets us change an item's priority or remove it in O(log n), instead of
+    re-inserting a duplicate and skipping the stale copy later - so the queue never holds more than one node per item.
+    Nodes are (priority, value, handle) tuples.
+    """
+    Node = Tuple[int, T, Hashable]
+
+    def __init__(self, tree:List[Any]=[], isMinHeap:bool=True):
+        """
+        :param tree: (priority, value) or (priority, value, handle) nodes to start with, in any order.
+        :param isMinHeap: whether the lowest priority comes out first.
+        """
+        self.positions:Dict[Hashable, int] = {}
+        super().__init__([self.make_node(*n) for n in tree], isMinHeap)
+
+    def make_node(self, priority:int, value:T, handle:Hashable=None) -> Node:
+        return (priority, value, value if handle is None else handle)
+
+    def heapify(self):
+        self.positions = {}
+        for index, n in enumerate(self.my_tree):
+            if n[2] in self.positions:
+                raise KeyError(f"The handle {n[2]!r} was used more than once.")
+            self.positions[n[2]] = index
+        super().heapify()
+
+    def extend(self, nodes:Iterable[Any]):
+        new_nodes = [self.make_node(*n) for n in nodes]
+        handles = set(n[2] for n in new_nodes)
+        if len(handles) != len(new_nodes) or not handles.isdisjoint(self.positions):
+            raise KeyError("Some of the new handles are repeated or already in this queue.")
+        start = len(self)
+        for index, n in enumerate(new_nodes):
+            self.my_tree.append(n)
+            self.positions[n[2]] = start + index
+        if len(new_nodes) > start:
+            super().heapify()
+        else:
+            for index in range(start, len(self)):
+                self.heapify_up(index)
+
+    def set_node_at_index(self, in_node:Node, index:int):
+        old_node = super().set_node_at_index(in_node, index)
+        # in a swap, the old node has already been written to its new index, so only forget it if it still maps here.
+        if self.positions.get(old_node[2]) == index:
+            del self.positions[old_node[2]]
+        self.positions[in_node[2]] = index
+        return old_node
+
+    def clear(self):
+        super().clear()
+        self.positions = {}
+
+    def contains(self, handle:Hashable) -> bool:
+        """
+        indicates whether an item with this handle is in the queue.
+        """
+        return handle in self.positions
+
+    def __contains__(self, handle:Hashable) -> bool:
+        return handle in self.positions
+
+    def index_of(self, handle:Hashable) -> int:
+        """
+        gives the position in my_tree of the item with this handle.
+        raises a KeyError if there is no such item.
+        """
+        if handle not in self.positions:
+            raise KeyError(f"The handle {handle!r} is not in this queue.")
+        return self.positions[handle]
+
+    def priority_of(self, handle:Hashable) -> int:
+        return self.my_tree[self.index_of(handle)][0]
+
+    def add_value(self, value:T, priority:int=1, handle:Hashable=None) -> Hashable:
+        """
+        adds a node to this data structure and makes sure that the my_tree data structure is still a heap.
+        :param value: the value to store
+        :param priority: its relative weight
+        :param handle: the key used to find this item later; defaults to the value itself.
+        :return: the handle
+        raises a KeyError if the handle is already in the queue.
+        """
+        new_node = self.make_node(priority, value, handle)
+        if new_node[2] in self.positions:
+            raise KeyError(f"The handle {new_node[2]!r} is already in this queue.")
+        self.my_tree.append(new_node)
+        self.positions[new_node[2]] = len(self) - 1
+        self.heapify_up(len(self) - 1)
+        return new_node[2]
+
+    def update_priority(self, handle:Hashable, priority:int):
+        """
+        changes the priority of the item with this handle, moving it up or down the tree as needed. This covers
+        both decrease-key and increase-key.
+        raises a KeyError if there is no such item.
+        """
+        index = self.index_of(handle)
+        old_node = self.my_tree[index]
+        self.my_tree[index] = (priority, old_node[1], handle)
+        if self._has_higher_priority(priority, old_node[0]):
+            self.heapify_up(index)
+        else:
+            self.heapify_down(index)
+
+    def remove(self, handle:Hashable) -> Node:
+        """
+        removes the item with this handle from wherever it is in the queue.
+        :return: the removed node
+        raises a KeyError if there is no such item.
+        """
+        index = self.index_of(handle)
+        result = self.my_tree[index]
+        del self.positions[handle]
+        last = self.my_tree.pop()
+        if index < len(self):
+            # fill the gap with the last node, which may belong above or below it.
+            self.my_tree[index] = last
+            self.positions[last[2]] = index
+            if self._has_higher_priority(last[0], result[0]):
+                self.heapify_up(index)
+            else:
+                self.heapify_down(index)
+        return result
+
+    def pop(self) -> Node:
+        if self.is_empty():
+            raise IndexError("Attempted to pop from an empty Queue.")
+        return self.remove(self.my_tree[0][2])
+
+    def pushpop(self, value:T, priority:int=1, handle:Hashable=None) -> Node:
+        new_node = self.make_node(priority, value, handle)
+        if new_node[2] in self.positions:
+            raise KeyError(f"The handle {new_node[2]!r} is already in this queue.")
+        if self.is_empty() or not self.a_has_priority_over_b(self.my_tree[0], new_node):
+            return new_node
+        return self._replace_root(new_node)
+
+    def replace(self, value:T, priority:int=1, handle:Hashable=None) -> Node:
+        if self.is_empty():
+            raise IndexError("Attempted to replace in an empty Queue.")
+        new_node = self.make_node(priority, value, handle)
+        if new_node[2] in self.positions and new_node[2] != self.my_tree[0][2]:
+            raise KeyError(f"The handle {new_node[2]!r} is already in this queue.")
+        return self._replace_root(new_node)
+
+    def _replace_root(self, new_node:Node) -> Node:
+        result = self.my_tree[0]
+        del self.positions[result[2]]
+        self.my_tree[0] = new_node
+        self.positions[new_node[2]] = 0
+        self.heapify_down()
+        return result
+
+    def heapify_up(self, index:int):
+        """
+        the same hole-moving sift as PriorityQueue.heapify_up, but records the new position of every node it moves.
+        """
+        tree = self.my_tree
+        positions = self.positions
+        has_higher_priority = self._has_higher_priority
+        node = tree[index]
+        priority = node[0]
+        while index > 0:
+            parent = (index - 1) >> 1
+            parent_node = tree[parent]
+            if not has_higher_priority(priority, parent_node[0]):
+                break
+            tree[index] = parent_node
+            positions[parent_node[2]] = index
+            index = parent
+        tree[index] = node
+        positions[node[2]] = index
+
+    def heapify_down(self, index:int=0):
+        """
+        the same hole-moving sift as PriorityQueue.heapify_down, but records the new position of every node it moves.
+        """
+        tree = self.my_tree
+        positions = self.positions
+        size = len(tree)
+        if index < 0 or index >= size:
+            return
+        has_higher_priority = self._has_higher_priority
+        node = tree[index]
+        priority = node[0]
+        while True:
+            child = (index << 1) + 1
+            if child >= size:
+                break
+            child_node = tree[child]
+            right = child + 1
+            if right < size and has_higher_priority(tree[right][0], child_node[0]):
+                child = right
+                child_node = tree[right]
+            if not has_higher_priority(child_node[0], priority):
+                break
+            tree[index] = child_node
+            positions[child_node[2]] = index
+            index = child
+        tree[index] = node
+        positions[node[2]] = index
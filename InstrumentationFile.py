@@ -0,0 +1,76 @@
+import time
+from typing import Callable, Dict
+
+
+class Metrics():
+    """
+    Collects how long each phase of the Huffman work takes (e.g. "tree", "encode") and counts of what it did
+    (e.g. "heap_operations", "tree_nodes", "bits_emitted"). Pass one to HuffmanEncoder(metrics=...) to profile it;
+    an encoder without one skips all of this.
+    :param on_phase: if given, called as on_phase(name, seconds) at the end of every phase.
+    """
+    def __init__(self, on_phase:Callable[[str, float], None]=None):
+        self.on_phase = on_phase
+        self.seconds:Dict[str, float] = {}  # total wall time per phase
+        self.calls:Dict[str, int] = {}  # number of times each phase ran
+        self.counts:Dict[str, int] = {}
+
+    def phase(self, name:str) -> "_Phase":
+        """
+        a context manager that times the code inside it as one run of the named phase.
+        """
+        return _Phase(self, name)
+
+    def add_time(self, name:str, seconds:float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.on_phase is not None:
+            self.on_phase(name, seconds)
+
+    def count(self, name:str, amount:int=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def report(self) -> Dict[str, Dict]:
+        """
+        gives everything recorded so far, as plain dictionaries (ready for json.dumps).
+        """
+        return {"seconds": dict(self.seconds), "calls": dict(self.calls), "counts": dict(self.counts)}
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+        self.counts.clear()
+
+    def __str__(self):
+        lines = [f"{name:20} {self.calls[name]:6} x {seconds * 1000:12.3f} ms" for name, seconds in self.seconds.items()]
+        lines += [f"{name:20} {count:12}" for name, count in self.counts.items()]
+        return "\n".join(lines)
+
+
+class _Phase():
+    def __init__(self, metrics:Metrics, name:str):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoPhase():
+    """
+    what HuffmanEncoder uses instead of a phase when there is no Metrics object: it does nothing at all.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_PHASE = _NoPhase()
@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Tuple
+
+# an item in package-merge: (weight, symbol index or -1 for a package, first half, second half)
+_Item = Tuple[int, int, Any, Any]
+
+
+def package_merge_code_lengths(frequencies:Dict[Any, int], max_length:int) -> Dict[Any, int]:
+    """
+    finds the optimal prefix code lengths that are all at most max_length bits, with the package-merge algorithm
+    (Larmore and Hirschberg). Think of each symbol as a set of coins, one for every level 1..max_length, worth its
+    count. Starting from the deepest level, the cheapest coins are paired up into "packages" that are offered to the
+    level above alongside its own coins; at the top, the 2n - 2 cheapest items are bought, and a symbol's code length
+    is the number of its coins inside them. Takes O(n * max_length) time.
+    :param frequencies: a dictionary {symbol -> count}
+    :param max_length: the longest code allowed.
+    :return: a dictionary {symbol -> code_length}
+    raises a ValueError if max_length is too small for the number of symbols (2 ** max_length < n).
+    """
+    symbols = sorted(frequencies.keys(), key=lambda symbol: frequencies[symbol])
+    n = len(symbols)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {symbols[0]: 0}
+    if max_length < 1 or (1 << max_length) < n:
+        raise ValueError(f"{n} symbols cannot all have codes of at most {max_length} bits.")
+
+    leaves:List[_Item] = [(frequencies[symbol], index, None, None) for index, symbol in enumerate(symbols)]
+    current:List[_Item] = leaves
+    for level in range(max_length - 1):
+        packages = [(current[i][0] + current[i + 1][0], -1, current[i], current[i + 1])
+                    for i in range(0, len(current) - 1, 2)]
+        current = _merge_by_weight(leaves, packages)
+
+    counts = [0] * n
+    stack = list(current[:2 * n - 2])
+    while len(stack) > 0:
+        weight, index, first, second = stack.pop()
+        if index >= 0:
+            counts[index] += 1
+        else:
+            stack.append(first)
+            stack.append(second)
+    return {symbol: counts[index] for index, symbol in enumerate(symbols)}
+
+
+def _merge_by_weight(leaves:List[_Item], packages:List[_Item]) -> List[_Item]:
+    """
+    merges two lists that are each sorted by weight; on ties, the leaf comes first.
+    """
+    merged:List[_Item] = []
+    i = 0
+    j = 0
+    while i < len(leaves) and j < len(packages):
+        if leaves[i][0] <= packages[j][0]:
+            merged.append(leaves[i])
+            i += 1
+        else:
+            merged.append(packages[j])
+            j += 1
+    merged.extend(leaves[i:])
+    merged.extend(packages[j:])
+    return merged
+
+
+def encoded_bit_count(frequencies:Dict[Any, int], lengths:Dict[Any, int]) -> int:
+    """
+    gives the number of bits it takes to encode the counted symbols with codes of the given lengths.
+    """
+    return sum(count * lengths[symbol] for symbol, count in frequencies.items())
@@ -0,0 +1,256 @@
+from PriorityQueueFile import PriorityQueue, T
+from array import array
+from typing import Iterable, List
+
+BACKENDS = ("list", "array")
+
+
+class DaryPriorityQueue (PriorityQueue[T]):
+    """
+    A PriorityQueue in which each node has up to `arity` children instead of 2. The tree is shallower (log base d of
+    n levels), so heapify_up takes fewer steps and a sift down touches fewer, more tightly packed, rows; in exchange,
+    heapify_down compares up to d children per level. Arity 4 is usually a good choice for push-heavy workloads.
+    The children of index i are at d*i + 1 ... d*i + d.
+    """
+    def __init__(self, tree:List[PriorityQueue.Node]=[], isMinHeap:bool=True, arity:int=4):
+        if arity < 2:
+            raise ValueError(f"A heap needs an arity of at least 2, not {arity}.")
+        self.arity = arity
+        super().__init__(tree, isMinHeap)
+
+    def left_child_of_index(self, index:int) -> int:
+        """
+        gives the index of the first (leftmost) child of the given index.
+        Note: the index may be out of bounds.
+        """
+        return self.arity * index + 1
+
+    def right_child_of_index(self, index:int) -> int:
+        """
+        gives the index of the last (rightmost) child of the given index.
+        Note: the index may be out of bounds.
+        """
+        return self.arity * index + self.arity
+
+    def parent_of_index(self, index:int) -> int:
+        return (index - 1) // self.arity if index > 0 else 0
+
+    def heapify(self):
+        for index in range((len(self) - 2) // self.arity, -1, -1):
+            self.heapify_down(index)
+
+    def is_a_heap(self) -> bool:
+        tree = self.my_tree
+        for index in range(1, len(tree)):
+            if self.a_has_priority_over_b(tree[index], tree[self.parent_of_index(index)]):
+                return False
+        return True
+
+    def heapify_up(self, index:int):
+        tree = self.my_tree
+        arity = self.arity
+        has_higher_priority = self._has_higher_priority
+        node = tree[index]
+        priority = node[0]
+        while index > 0:
+            parent = (index - 1) // arity
+            parent_node = tree[parent]
+            if not has_higher_priority(priority, parent_node[0]):
+                break
+            tree[index] = parent_node
+            index = parent
+        tree[index] = node
+
+    def heapify_down(self, index:int=0):
+        tree = self.my_tree
+        arity = self.arity
+        size = len(tree)
+        if index < 0 or index >= size:
+            return
+        has_higher_priority = self._has_higher_priority
+        node = tree[index]
+        priority = node[0]
+        while True:
+            first_child = arity * index + 1
+            if first_child >= size:
+                break
+            # find the child with the highest priority; ties go to the leftmost, as in the binary heap.
+            best = first_child
+            best_priority = tree[first_child][0]
+            for child in range(first_child + 1, min(first_child + arity, size)):
+                child_priority = tree[child][0]
+                if has_higher_priority(child_priority, best_priority):
+                    best = child
+                    best_priority = child_priority
+            if not has_higher_priority(best_priority, priority):
+                break
+            tree[index] = tree[best]
+            index = best
+        tree[index] = node
+
+
+class ArrayPriorityQueue (DaryPriorityQueue[T]):
+    """
+    A d-ary PriorityQueue stored as a struct of arrays: the priorities live in a typed array (8 bytes each, with no
+    per-node object) and the values in a parallel list, instead of one (priority, value) tuple per node.
+    For tens of millions of entries this takes a fraction of the memory of the list-of-tuples layout.
+    Nodes are still handed in and out as (priority, value) tuples, and my_tree can still be read (it is built on
+    request), so the printing and checking methods keep working.
+    :param typecode: "q" for int priorities (signed 64-bit) or "d" for float priorities.
+    """
+    def __init__(self, tree:Iterable[PriorityQueue.Node]=[], isMinHeap:bool=True, arity:int=2,
+                 typecode:str="q"):
+        if arity < 2:
+            raise ValueError(f"A heap needs an arity of at least 2, not {arity}.")
+        if typecode not in ("q", "d"):
+            raise ValueError(f"Priorities must be stored as 'q' (ints) or 'd' (floats), not {typecode!r}.")
+        self.arity = arity
+        self.is_min_heap = isMinHeap
+        self.priorities = array(typecode)
+        self.values:List[T] = []
+        for n in tree:
+            self.priorities.append(n[0])
+            self.values.append(n[1])
+        self.heapify()
+
+    @property
+    def my_tree(self) -> List[PriorityQueue.Node]:
+        return list(zip(self.priorities, self.values))
+
+    def __len__(self):
+        return len(self.values)
+
+    def node_at_index(self, index:int) -> PriorityQueue.Node:
+        if self.in_bounds(index):
+            return (self.priorities[index], self.values[index])
+        raise IndexError("Index {0} is out of bounds for tree of size {1}".format(index, len(self)))
+
+    def set_node_at_index(self, in_node:PriorityQueue.Node, index:int):
+        old_node = self.node_at_index(index)
+        self.priorities[index] = in_node[0]
+        self.values[index] = in_node[1]
+        return old_node
+
+    def clear(self):
+        del self.priorities[:]
+        self.values = []
+
+    def extend(self, nodes:Iterable[PriorityQueue.Node]):
+        new_nodes = list(nodes)
+        start = len(self)
+        for n in new_nodes:
+            self.priorities.append(n[0])
+            self.values.append(n[1])
+        if len(new_nodes) > start:
+            self.heapify()
+        else:
+            for index in range(start, len(self)):
+                self.heapify_up(index)
+
+    def is_a_heap(self) -> bool:
+        priorities = self.priorities
+        for index in range(1, len(priorities)):
+            if self._has_higher_priority(priorities[index], priorities[self.parent_of_index(index)]):
+                return False
+        return True
+
+    def add_value(self, value:T, priority:int=1):
+        self.priorities.append(priority)
+        self.values.append(value)
+        self.heapify_up(len(self) - 1)
+
+    def peek(self) -> PriorityQueue.Node:
+        if self.is_empty():
+            raise IndexError("Attempted to peek at an empty Queue.")
+        return (self.priorities[0], self.values[0])
+
+    def pop(self) -> PriorityQueue.Node:
+        if self.is_empty():
+            raise IndexError("Attempted to pop from an empty Queue.")
+        result = (self.priorities[0], self.values[0])
+        last_priority = self.priorities.pop()
+        last_value = self.values.pop()
+        if len(self) > 0:
+            self.priorities[0] = last_priority
+            self.values[0] = last_value
+            self.heapify_down()
+        return result
+
+    def pushpop(self, value:T, priority:int=1) -> PriorityQueue.Node:
+        if self.is_empty() or not self._has_higher_priority(self.priorities[0], priority):
+            return (priority, value)
+        return self.replace(value, priority)
+
+    def replace(self, value:T, priority:int=1) -> PriorityQueue.Node:
+        if self.is_empty():
+            raise IndexError("Attempted to replace in an empty Queue.")
+        result = (self.priorities[0], self.values[0])
+        self.priorities[0] = priority
+        self.values[0] = value
+        self.heapify_down()
+        return result
+
+    def heapify_up(self, index:int):
+        priorities = self.priorities
+        values = self.values
+        arity = self.arity
+        has_higher_priority = self._has_higher_priority
+        priority = priorities[index]
+        value = values[index]
+        while index > 0:
+            parent = (index - 1) // arity
+            parent_priority = priorities[parent]
+            if not has_higher_priority(priority, parent_priority):
+                break
+            priorities[index] = parent_priority
+            values[index] = values[parent]
+            index = parent
+        priorities[index] = priority
+        values[index] = value
+
+    def heapify_down(self, index:int=0):
+        priorities = self.priorities
+        values = self.values
+        arity = self.arity
+        size = len(values)
+        if index < 0 or index >= size:
+            return
+        has_higher_priority = self._has_higher_priority
+        priority = priorities[index]
+        value = values[index]
+        while True:
+            first_child = arity * index + 1
+            if first_child >= size:
+                break
+            best = first_child
+            best_priority = priorities[first_child]
+            for child in range(first_child + 1, min(first_child + arity, size)):
+                child_priority = priorities[child]
+                if has_higher_priority(child_priority, best_priority):
+                    best = child
+                    best_priority = child_priority
+            if not has_higher_priority(best_priority, priority):
+                break
+            priorities[index] = best_priority
+            values[index] = values[best]
+            index = best
+        priorities[index] = priority
+        values[index] = value
+
+
+def make_priority_queue(tree:Iterable[PriorityQueue.Node]=[], isMinHeap:bool=True, backend:str="list",
+                        arity:int=2, typecode:str="q") -> PriorityQueue:
+    """
+    builds a priority queue with the chosen storage layout and arity. All of them have the PriorityQueue API.
+    :param backend: "list" for a list of (priority, value) tuples, or "array" for a typed array of priorities with
+    a parallel list of values.
+    :param arity: the number of children per node; 2 is a binary heap.
+    :param typecode: for the "array" backend, "q" for int priorities or "d" for float priorities.
+    """
+    if backend == "list":
+        if arity == 2:
+            return PriorityQueue(list(tree), isMinHeap)
+        return DaryPriorityQueue(list(tree), isMinHeap, arity)
+    if backend == "array":
+        return ArrayPriorityQueue(tree, isMinHeap, arity, typecode)
+    raise ValueError(f"Unknown priority queue backend {backend!r}; choose one of {BACKENDS}.")
@@ -1,5 +1,6 @@
 import math
-from typing import List, TypeVar, Generic, Tuple
+import operator
+from typing import Iterable, List, TypeVar, Generic, Tuple
 
 T = TypeVar("T")
 
@@ -9,10 +10,52 @@ show_debug_messages = False
 class PriorityQueue (Generic[T]):
     Node = Tuple[int,T]
     def __init__(self, tree:List[Node]=[], isMinHeap:bool=True):
+        """
+        :param tree: (priority, value) nodes to start with, in any order; they are put into heap order in O(n).
+        :param isMinHeap: whether the lowest priority comes out first.
+        """
         self.my_tree:List["Node"] = []
         for n in tree:
             self.my_tree.append(n)
         self.is_min_heap = isMinHeap
+        self.heapify()
+
+    @property
+    def is_min_heap(self) -> bool:
+        return self._is_min_heap
+
+    @is_min_heap.setter
+    def is_min_heap(self, isMinHeap:bool):
+        """
+        picks the priority comparison once, here, so the sifts don't have to check is_min_heap at every step.
+        """
+        self._is_min_heap = isMinHeap
+        self._has_higher_priority = operator.lt if isMinHeap else operator.gt
+
+    def heapify(self):
+        """
+        puts all of my_tree into heap order at once, in O(n) time (Floyd's method): every node that has children is
+        sifted down, starting from the last one and working back to the root. This is much cheaper than calling
+        add_value n times, which is O(n log n).
+        postcondition: the tree is a heap
+        """
+        for index in range(len(self) // 2 - 1, -1, -1):
+            self.heapify_down(index)
+
+    def extend(self, nodes:Iterable[Node]):
+        """
+        adds many (priority, value) nodes at once. If there are a lot of them compared to the size of the heap, they
+        are appended and the whole heap is rebuilt with heapify(); otherwise each one is sifted up on its own.
+        postcondition: the tree is a heap
+        """
+        new_nodes = list(nodes)
+        if len(new_nodes) > len(self):
+            self.my_tree.extend(new_nodes)
+            self.heapify()
+        else:
+            for n in new_nodes:
+                self.my_tree.append(n)
+                self.heapify_up(len(self) - 1)
 
 
     def node_at_index(self, index:int) -> Node:
@@ -66,7 +109,7 @@ class PriorityQueue (Generic[T]):
         :param index:
         :return index above the given node index:
         """
-        return int((index - 1) / 2)  # yay, integer math!
+        return (index - 1) >> 1 if index > 0 else 0  # yay, integer math!
 
     def __len__(self):
         return len(self.my_tree)
@@ -101,9 +144,7 @@ class PriorityQueue (Generic[T]):
         by self.is_min_heap - i.e, should the higher node prevail, or the lower node?
         If the values are equal, then we _do not_ say that the "a" node has priority.
         """
-        if self.is_min_heap:
-            return a[0] < b[0]
-        return a[0] > b[0]
+        return self._has_higher_priority(a[0], b[0])
 
     def is_empty(self)->bool:
         return len(self) == 0
@@ -211,7 +252,7 @@ class PriorityQueue (Generic[T]):
         if (show_debug_messages):
             print("-" * 128)
             print(f"Adding: [{priority = }, {value = }]")
-        self.my_tree.append([priority, value])  # makes a new, 2-element list and adds it to the main array.
+        self.my_tree.append((priority, value))  # makes a new (priority, value) tuple and adds it to the main array.
         self.heapify_up(len(self) - 1)
         if (show_debug_messages):
             print(self)
@@ -224,22 +265,60 @@ class PriorityQueue (Generic[T]):
         :param index:
         :return None:
         """
-        while self.a_has_priority_over_b(self.my_tree[index],self.my_tree[self.parent_of_index(index)]):
-            p = self.my_tree[self.parent_of_index(index)]
-            self.my_tree[self.parent_of_index(index)] = self.my_tree[index]
-            self.my_tree[index]=p
-            index = self.parent_of_index(index)
-        # ----------------------
-        # ----------------------
+        # rather than swapping at every level, lift the node out, slide parents down into the "hole" it leaves, and
+        # drop the node in where the hole stops.
+        tree = self.my_tree
+        has_higher_priority = self._has_higher_priority
+        node = tree[index]
+        priority = node[0]
+        while index > 0:
+            parent = (index - 1) >> 1
+            parent_node = tree[parent]
+            if not has_higher_priority(priority, parent_node[0]):
+                break
+            tree[index] = parent_node
+            index = parent
+        tree[index] = node
 
     def peek(self) -> Node:
         """
         Gives the node at the start of this Priority Queue without removing it.
         """
-        if self.isEmpty():
+        if self.is_empty():
             raise IndexError("Attempted to peek at an empty Queue.")
         return self.my_tree[0]
 
+    def pushpop(self, value:T, priority:int=1) -> Node:
+        """
+        Adds a node and then pops the first node, with (at most) one sift instead of two. If the new node would come
+        out first anyway, it is returned without touching the tree.
+        :param value: the value to store
+        :param priority: its relative weight
+        :return: the removed node
+        """
+        new_node:"Node" = (priority, value)
+        if self.is_empty() or not self.a_has_priority_over_b(self.my_tree[0], new_node):
+            return new_node
+        result:"Node" = self.my_tree[0]
+        self.my_tree[0] = new_node
+        self.heapify_down()
+        return result
+
+    def replace(self, value:T, priority:int=1) -> Node:
+        """
+        Pops the first node and then adds a new one, with one sift instead of two. Unlike pushpop, the node that is
+        returned is always the old first node, even if the new node has priority over it.
+        :param value: the value to store
+        :param priority: its relative weight
+        :return: the removed node
+        """
+        if self.is_empty():
+            raise IndexError("Attempted to replace in an empty Queue.")
+        result:"Node" = self.my_tree[0]
+        self.my_tree[0] = (priority, value)
+        self.heapify_down()
+        return result
+
     def pop(self) -> Node:
         """
         Removes the node at the start of this Priority Queue and resets the Queue so that it is in order; then
@@ -265,32 +344,25 @@ class PriorityQueue (Generic[T]):
         precondition: the tree is a heap, except possibly for the node at "index."
         postcondition: the tree is once again a heap
         """
-        if not self.in_bounds(index):
+        tree = self.my_tree
+        size = len(tree)
+        if index < 0 or index >= size:
             return
-        current_index = index
-        left_index:int = self.left_child_of_index(index)
-        right_index:int = self.right_child_of_index(index)
-        breaker:bool = False
-        if self.in_bounds(left_index):
-            wrongB = False
-            wrongA = self.a_has_priority_over_b(self.my_tree[left_index], self.my_tree[current_index])
-            if self.in_bounds(right_index):
-                wrongB = self.a_has_priority_over_b(self.my_tree[right_index], self.my_tree[current_index])
-            if wrongB and wrongA:
-                if self.a_has_priority_over_b(self.my_tree[right_index],self.my_tree[left_index]):
-                    new_index = right_index
-                else:
-                    new_index = left_index
-            elif wrongA:
-                new_index = left_index
-            elif wrongB:
-                new_index = right_index
-            else:
-                return
-            n = self.my_tree[current_index]
-            self.set_node_at_index(self.my_tree[new_index], current_index)
-            self.set_node_at_index(n, new_index)
-            self.heapify_down(new_index)
-        else:
-            return
-
+        has_higher_priority = self._has_higher_priority
+        node = tree[index]
+        priority = node[0]
+        # the same "hole" trick as heapify_up, moving down: children slide up until the node fits.
+        while True:
+            child = (index << 1) + 1
+            if child >= size:
+                break
+            child_node = tree[child]
+            right = child + 1
+            if right < size and has_higher_priority(tree[right][0], child_node[0]):
+                child = right
+                child_node = tree[right]
+            if not has_higher_priority(child_node[0], priority):
+                break
+            tree[index] = child_node
+            index = child
+        tree[index] = node
@@ -0,0 +1,189 @@
+"""
+Random access into Huffman-encoded data, through an index of sync points.
+
+While a message is encoded, the bit offset of every interval-th symbol is recorded. To get symbols start:stop, a
+decoder jumps to the last sync point at or before start and decodes only up to stop, instead of from bit 0. Sync
+points fall on every interval-th symbol, so only their bit offsets need storing; the symbol offset of point i is
+i * interval.
+
+A file made by write_random_access holds the code, the index and the encoded bits together. open_random_access maps it
+into memory (mmap) and decodes straight out of the mapping, so a query reads only the pages it needs:
+
+    MAGIC
+    canonical code-length header (see CanonicalCodeFile.serialize_code_lengths)
+    varint interval, varint symbol_count, varint bit_length, varint point_count
+    for each sync point, the gap from the previous point's bit offset, as a varint
+    ceil(bit_length / 8) bytes of packed bits
+"""
+import mmap
+from array import array
+from typing import Any, BinaryIO, List, Tuple
+
+from HuffmanEncoderFile import HuffmanEncoder
+from BitStreamFile import BitWriter
+from CanonicalCodeFile import write_varint, read_varint, parse_code_lengths
+
+MAGIC = b"HUFR"
+DEFAULT_INTERVAL = 4096
+
+
+class SyncIndex():
+    """
+    :param interval: the number of symbols between sync points.
+    :param symbol_count: and bit_length: the size of the whole encoded message.
+    :param bit_offsets: where symbol i * interval starts, for every i with i * interval < symbol_count.
+    """
+    def __init__(self, interval:int, symbol_count:int=0, bit_length:int=0, bit_offsets:array=None):
+        if interval < 1:
+            raise ValueError(f"The sync interval must be at least 1, not {interval}.")
+        self.interval = interval
+        self.symbol_count = symbol_count
+        self.bit_length = bit_length
+        self.bit_offsets = bit_offsets if bit_offsets is not None else array("Q")
+
+    def __len__(self):
+        return len(self.bit_offsets)
+
+    def locate(self, symbol:int) -> Tuple[int, int]:
+        """
+        finds the last sync point at or before symbol.
+        :return: (its symbol offset, its bit offset)
+        """
+        if symbol < 0 or symbol >= self.symbol_count:
+            raise IndexError(f"Symbol {symbol} is out of bounds for a message of {self.symbol_count} symbols.")
+        point = symbol // self.interval
+        return point * self.interval, self.bit_offsets[point]
+
+    def serialize(self) -> bytes:
+        data = bytearray()
+        for number in (self.interval, self.symbol_count, self.bit_length, len(self.bit_offsets)):
+            write_varint(data, number)
+        previous = 0
+        for bit_offset in self.bit_offsets:
+            write_varint(data, bit_offset - previous)
+            previous = bit_offset
+        return bytes(data)
+
+    @classmethod
+    def parse(cls, data, offset:int=0) -> Tuple["SyncIndex", int]:
+        """
+        reads an index made by serialize.
+        :return: (the index, the offset just after it)
+        """
+        interval, offset = read_varint(data, offset)
+        symbol_count, offset = read_varint(data, offset)
+        bit_length, offset = read_varint(data, offset)
+        point_count, offset = read_varint(data, offset)
+        if point_count != -(-symbol_count // max(1, interval)):
+            raise ValueError(f"The index has {point_count} sync points, which does not match its size.")
+        bit_offsets = array("Q")
+        bit_offset = 0
+        for i in range(point_count):
+            gap, offset = read_varint(data, offset)
+            bit_offset += gap
+            bit_offsets.append(bit_offset)
+        return cls(interval, symbol_count, bit_length, bit_offsets), offset
+
+
+def encode_with_sync_points(encoder:HuffmanEncoder, message, interval:int=DEFAULT_INTERVAL) \
+        -> Tuple[bytearray, int, SyncIndex]:
+    """
+    encodes message like encoder.encode_message_packed, recording a sync point every interval symbols.
+    :param message: a string, bytes or any other sequence of symbols that encoder has codes for.
+    :return: (the packed bits, the number of bits, the index)
+    """
+    if encoder.code_table is None:
+        encoder.build_code_table()
+    index = SyncIndex(interval, len(message))
+    writer = BitWriter()
+    for start in range(0, len(message), interval):
+        index.bit_offsets.append(writer.bit_length)
+        writer.write_symbols(message[start:start + interval], encoder.code_table)
+    index.bit_length = writer.bit_length
+    return writer.getvalue(), writer.bit_length, index
+
+
+class RandomAccessDecoder():
+    """
+    Decodes slices of an encoded message without decoding what comes before them.
+    :param decoder: an encoder for the code the message was encoded with.
+    :param data: the packed bits; a memoryview (e.g. of an mmap) is used as is, without copying.
+    :param index: the message's sync points.
+    """
+    def __init__(self, decoder:HuffmanEncoder, data, index:SyncIndex):
+        if decoder.decode_table is None:
+            decoder.build_decode_table()
+        self.decoder = decoder
+        self.data = data
+        self.index = index
+        self.text = all(isinstance(symbol, str) for symbol in decoder.code_table)
+
+    def __len__(self):
+        return self.index.symbol_count
+
+    def decode_symbols(self, start:int, stop:int) -> List[Any]:
+        """
+        decodes symbols start:stop of the message (clipped to its length, like a slice).
+        """
+        start = max(0, start)
+        stop = min(stop, self.index.symbol_count)
+        if start >= stop:
+            return []
+        table = self.decoder.decode_table
+        if table.max_length == 0:
+            return [next(iter(self.decoder.code_table))] * (stop - start)
+        point_symbol, point_bit = self.index.locate(start)
+        symbols = table.decode_symbols(self.data, self.index.bit_length, point_bit, stop - point_symbol)
+        if len(symbols) != stop - point_symbol:
+            raise ValueError(f"The encoded data ended after symbol {point_symbol + len(symbols)}, before {stop}.")
+        return symbols[start - point_symbol:]
+
+    def __getitem__(self, key):
+        """
+        decoder[i] gives symbol i; decoder[start:stop] gives that slice, as a string (or bytes, for int symbols).
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.index.symbol_count)
+            if step != 1:
+                raise ValueError("Only slices with a step of 1 are supported.")
+            symbols = self.decode_symbols(start, stop)
+            return "".join(symbols) if self.text else bytes(symbols)
+        if key < 0:
+            key += self.index.symbol_count
+        if key < 0 or key >= self.index.symbol_count:
+            raise IndexError(f"Symbol {key} is out of bounds for a message of {self.index.symbol_count} symbols.")
+        return self.decode_symbols(key, key + 1)[0]
+
+
+def write_random_access(destination:BinaryIO, encoder:HuffmanEncoder, message, interval:int=DEFAULT_INTERVAL):
+    """
+    encodes message into destination, in the format open_random_access reads.
+    :param encoder: a canonical encoder (its code has to be stored as a header).
+    """
+    data, bit_length, index = encode_with_sync_points(encoder, message, interval)
+    destination.write(MAGIC)
+    destination.write(encoder.get_header())
+    destination.write(index.serialize())
+    destination.write(data)
+
+
+def read_random_access(buffer) -> RandomAccessDecoder:
+    """
+    reads a file made by write_random_access out of buffer (bytes, an mmap, ...), without copying the encoded bits.
+    """
+    view = memoryview(buffer).cast("B")
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError("This is not a RandomAccessFile encoded file.")
+    lengths, offset = parse_code_lengths(view, len(MAGIC))
+    index, offset = SyncIndex.parse(view, offset)
+    if 8 * (len(view) - offset) < index.bit_length:
+        raise ValueError("The encoded bits are cut short.")
+    return RandomAccessDecoder(HuffmanEncoder.from_code_lengths(lengths), view[offset:], index)
+
+
+def open_random_access(source:BinaryIO) -> RandomAccessDecoder:
+    """
+    memory-maps an open file made by write_random_access (read-only) and gives a decoder over the mapping. The
+    mapping stays open as long as the decoder is in use.
+    """
+    return read_random_access(mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ))
@@ -0,0 +1,143 @@
+"""
+Encoding many short records with one shared code, into one contiguous buffer.
+
+A RecordBatch holds the codes of all its records back to back in a single packed bit string (no padding between
+records), plus two offset columns: where each record's bits start, and where its symbols start in the decoded
+output. Record i is bits bit_offsets[i]:bit_offsets[i + 1], and decodes to symbol_offsets[i + 1] - symbol_offsets[i]
+symbols. to_bytes() gives the whole batch as one buffer, ready to be written to disk in one go:
+
+    MAGIC
+    a byte: 0 if the records are strings, 1 if they are bytes
+    varint record count
+    bit_offsets then symbol_offsets, each record count + 1 little-endian unsigned 64-bit ints
+    the packed bits
+
+The code itself is not stored; keep the encoder's header (HuffmanEncoder.get_header) alongside the batch.
+"""
+import itertools
+import sys
+from array import array
+from typing import Iterable, List, Sequence, Union
+
+from HuffmanEncoderFile import HuffmanEncoder
+from BitStreamFile import BitWriter
+from CanonicalCodeFile import write_varint, read_varint
+
+MAGIC = b"HUFN"
+
+Record = Union[str, bytes]
+
+
+def _little_endian(column:array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+class RecordBatch():
+    """
+    :param data: the packed bits of every record.
+    :param bit_offsets: and symbol_offsets: arrays of record count + 1 offsets, starting with 0.
+    :param text: True if the records are strings, False if they are bytes.
+    """
+    def __init__(self, data, bit_offsets:array, symbol_offsets:array, text:bool=True):
+        if len(bit_offsets) != len(symbol_offsets) or len(bit_offsets) == 0:
+            raise ValueError("A batch needs one more bit offset and symbol offset than it has records.")
+        self.data = data
+        self.bit_offsets = bit_offsets
+        self.symbol_offsets = symbol_offsets
+        self.text = text
+
+    def __len__(self):
+        return len(self.bit_offsets) - 1
+
+    @property
+    def bit_length(self) -> int:
+        return self.bit_offsets[-1]
+
+    def to_bytes(self) -> bytes:
+        result = bytearray(MAGIC)
+        result.append(0 if self.text else 1)
+        write_varint(result, len(self))
+        result += _little_endian(self.bit_offsets)
+        result += _little_endian(self.symbol_offsets)
+        result += self.data[:-(-self.bit_length // 8)]
+        return bytes(result)
+
+    @classmethod
+    def from_bytes(cls, buffer) -> "RecordBatch":
+        """
+        reads a batch made by to_bytes. The packed bits are a memoryview into buffer, not a copy.
+        """
+        view = memoryview(buffer).cast("B")
+        if bytes(view[:len(MAGIC)]) != MAGIC or len(view) <= len(MAGIC):
+            raise ValueError("This is not a RecordBatchFile batch.")
+        kind = view[len(MAGIC)]
+        if kind not in (0, 1):
+            raise ValueError(f"Unknown record kind: {kind}.")
+        count, offset = read_varint(view, len(MAGIC) + 1)
+        columns:List[array] = []
+        for i in range(2):
+            column = array("Q")
+            end = offset + column.itemsize * (count + 1)
+            if end > len(view):
+                raise ValueError("The batch's offsets are cut short.")
+            column.frombytes(view[offset:end])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+            offset = end
+        batch = cls(view[offset:], columns[0], columns[1], kind == 0)
+        if 8 * len(batch.data) < batch.bit_length:
+            raise ValueError("The batch's packed bits are cut short.")
+        return batch
+
+
+def encode_batch(encoder:HuffmanEncoder, records:Iterable[Record]) -> RecordBatch:
+    """
+    encodes every record with encoder's code into one RecordBatch, in a single pass.
+    :param records: strings, or bytes for an encoder whose symbols are byte values - all of the same kind.
+    """
+    if encoder.code_table is None:
+        encoder.build_code_table()
+    records = iter(records)
+    first = next(records, None)
+    bit_offsets = array("Q", [0])
+    symbol_offsets = array("Q", [0])
+    writer = BitWriter()
+    if first is not None:
+        writer.write_records(itertools.chain((first,), records), encoder.code_table, bit_offsets, symbol_offsets)
+    return RecordBatch(writer.getvalue(), bit_offsets, symbol_offsets, not isinstance(first, (bytes, bytearray)))
+
+
+def decode_batch(encoder:HuffmanEncoder, batch:RecordBatch, indices:Sequence[int]=None) -> List[Record]:
+    """
+    decodes the records of a batch made by encode_batch.
+    :param indices: which records to decode, in the order wanted; defaults to all of them. Only the bits of the
+    chosen records are read.
+    """
+    if encoder.decode_table is None:
+        encoder.build_decode_table()
+    table = encoder.decode_table
+    join = "".join if batch.text else bytes
+
+    def decode(start_bit:int, end_bit:int, symbol_count:int) -> Record:
+        if table.max_length == 0:
+            # a one-symbol code has no bits to read.
+            return join([next(iter(encoder.code_table))] * symbol_count)
+        symbols = table.decode_symbols(batch.data, end_bit, start_bit, symbol_count) if symbol_count > 0 else []
+        if len(symbols) != symbol_count:
+            raise ValueError(f"Bits {start_bit}:{end_bit} decoded to {len(symbols)} symbols instead of {symbol_count}.")
+        return join(symbols)
+
+    starts = batch.symbol_offsets
+    if indices is None:
+        symbols = decode(0, batch.bit_length, starts[-1])
+        return [symbols[starts[i]:starts[i + 1]] for i in range(len(batch))]
+    records:List[Record] = []
+    for i in indices:
+        if i < 0 or i >= len(batch):
+            raise IndexError(f"Record {i} is out of bounds for a batch of {len(batch)} records.")
+        records.append(decode(batch.bit_offsets[i], batch.bit_offsets[i + 1], starts[i + 1] - starts[i]))
+    return records
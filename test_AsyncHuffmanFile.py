@@ -0,0 +1,110 @@
+"""
+Tests for AsyncHuffmanFile. Run with:
+
+    python -m unittest test_AsyncHuffmanFile
+"""
+import asyncio
+import io
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import AsyncHuffmanFile
+import HuffmanStreamFile
+
+PAYLOAD = bytes(random.Random(17).choices(range(64), weights=[1 / (i + 1) for i in range(64)], k=200000))
+
+
+async def chunks_of(data:bytes, size:int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(pieces) -> bytes:
+    return b"".join([piece async for piece in pieces])
+
+
+class AsyncHuffmanTest(unittest.IsolatedAsyncioTestCase):
+    async def test_loopback_stream_reader(self):
+        # the client sends a compressed stream over a real socket; the echo server decompresses it and sends the
+        # same bytes back compressed.
+        server = await asyncio.start_server(AsyncHuffmanFile._echo, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            encoder = AsyncHuffmanFile.byte_encoder(PAYLOAD[:1000])
+            send = AsyncHuffmanFile.compress_to(chunks_of(PAYLOAD, 30000), writer, encoder, chunk_size=30000)
+            _, echoed = await asyncio.gather(send, collect(AsyncHuffmanFile.decode_chunks(reader)))
+            writer.close()
+            await writer.wait_closed()
+        self.assertEqual(echoed, PAYLOAD)
+
+    async def test_stream_reader_source(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data(PAYLOAD)
+        reader.feed_eof()
+        compressed = await collect(AsyncHuffmanFile.encode_chunks(reader, AsyncHuffmanFile.byte_encoder(),
+                                                                  chunk_size=4096))
+        self.assertEqual(b"".join(HuffmanStreamFile.decode_chunks(io.BytesIO(compressed))), PAYLOAD)
+
+    async def test_async_iterator_source(self):
+        # written by the synchronous codec, read back in small pieces through an async iterator.
+        compressed = io.BytesIO()
+        HuffmanStreamFile.compress_stream(io.BytesIO(PAYLOAD), compressed, 50000)
+        decoded = await collect(AsyncHuffmanFile.decode_chunks(chunks_of(compressed.getvalue(), 7)))
+        self.assertEqual(decoded, PAYLOAD)
+
+    async def check_offload(self, executor):
+        encoder = AsyncHuffmanFile.byte_encoder(PAYLOAD[:1000])
+        inline = await collect(AsyncHuffmanFile.encode_chunks(chunks_of(PAYLOAD, 50000), encoder, offload_size=None))
+        offloaded = await collect(AsyncHuffmanFile.encode_chunks(chunks_of(PAYLOAD, 50000), encoder,
+                                                                 executor=executor, offload_size=1))
+        self.assertEqual(offloaded, inline)
+        decoded = await collect(AsyncHuffmanFile.decode_chunks(chunks_of(offloaded, 10000), executor=executor,
+                                                               offload_size=1))
+        self.assertEqual(decoded, PAYLOAD)
+
+    async def test_offload_to_thread_pool(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            await self.check_offload(executor)
+
+    async def test_offload_to_process_pool(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            await self.check_offload(executor)
+
+    async def test_offload_to_default_executor(self):
+        await self.check_offload(None)
+
+    async def test_truncated_stream(self):
+        compressed = await collect(AsyncHuffmanFile.encode_chunks(chunks_of(PAYLOAD, 50000),
+                                                                  AsyncHuffmanFile.byte_encoder()))
+        with self.assertRaises(ValueError):
+            await collect(AsyncHuffmanFile.decode_chunks(chunks_of(compressed[:-3], 1000)))
+        reader = asyncio.StreamReader()
+        reader.feed_data(compressed[:len(compressed) // 2])
+        reader.feed_eof()
+        with self.assertRaises(ValueError):
+            await collect(AsyncHuffmanFile.decode_chunks(reader))
+
+    async def test_not_a_stream(self):
+        with self.assertRaises(ValueError):
+            await collect(AsyncHuffmanFile.decode_chunks(chunks_of(b"nope" + bytes(10), 4)))
+
+    async def test_empty_stream(self):
+        compressed = await collect(AsyncHuffmanFile.encode_chunks(chunks_of(b"", 10), AsyncHuffmanFile.byte_encoder()))
+        self.assertEqual(b"".join(HuffmanStreamFile.decode_chunks(io.BytesIO(compressed))), b"")
+        self.assertEqual(await collect(AsyncHuffmanFile.decode_chunks(chunks_of(compressed, 3))), b"")
+        # a stream with no code at all, as compress_stream writes for empty input.
+        empty = io.BytesIO()
+        HuffmanStreamFile.compress_stream(io.BytesIO(b""), empty)
+        self.assertEqual(await collect(AsyncHuffmanFile.decode_chunks(chunks_of(empty.getvalue(), 1))), b"")
+
+    async def test_single_byte_value(self):
+        compressed = io.BytesIO()
+        HuffmanStreamFile.compress_stream(io.BytesIO(b"a" * 1000), compressed, 300)
+        self.assertEqual(await collect(AsyncHuffmanFile.decode_chunks(chunks_of(compressed.getvalue(), 5))),
+                         b"a" * 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
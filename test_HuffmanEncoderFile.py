@@ -0,0 +1,100 @@
+"""
+Cross-checks the decoders of HuffmanEncoderFile against each other. Run with:
+
+    python -m unittest test_HuffmanEncoderFile
+"""
+import random
+import string
+import unittest
+
+from HuffmanEncoderFile import HuffmanEncoder, TREE_CONSTRUCTIONS
+from CanonicalCodeFile import serialize_code_lengths
+from DecodeTableFile import DEFAULT_LOOKUP_BITS
+from FlatTreeFile import FlatTree
+
+
+def fibonacci_text(letters:int) -> str:
+    """
+    a text whose letter counts are Fibonacci numbers, which gives the deepest possible Huffman tree: its longest
+    code is letters - 1 bits.
+    """
+    counts = [1, 1]
+    while len(counts) < letters:
+        counts.append(counts[-1] + counts[-2])
+    text = [letter * count for letter, count in zip(string.ascii_letters, counts)]
+    random.Random(letters).shuffle(text)
+    return "".join(text)
+
+
+def sample_texts():
+    rng = random.Random(1)
+    yield "uniform", "".join(rng.choices(string.ascii_letters + string.digits, k=5000))
+    yield "skewed", "".join(rng.choices("etaoin shrdlu", weights=[2 ** -i for i in range(13)], k=5000))
+    yield "two letters", "ab" * 10 + "a"
+    yield "long codes", fibonacci_text(20)
+
+
+class HuffmanEncoderTest(unittest.TestCase):
+    def check_round_trip(self, text:str, **options):
+        encoder = HuffmanEncoder(text, **options)
+        encoder.do_setup()
+        bits = encoder.encode_message(text)
+        packed, bit_length = encoder.encode_message_packed(text)
+        self.assertEqual(bit_length, len(bits))
+        self.assertEqual(encoder.decode_message(bits), text)
+        self.assertEqual(encoder.decode_message_packed(packed, bit_length), text)
+        self.assertEqual(encoder.decode_message_with_tree(bits), text)
+        self.assertEqual(isinstance(encoder.encoding_tree, FlatTree), options.get("flat_tree", False))
+        return encoder
+
+    def test_round_trip(self):
+        for name, text in sample_texts():
+            for flat_tree in (False, True):
+                for construction in TREE_CONSTRUCTIONS:
+                    for canonical in (False, True):
+                        with self.subTest(name, flat_tree=flat_tree, construction=construction, canonical=canonical):
+                            self.check_round_trip(text, flat_tree=flat_tree, construction=construction,
+                                                  canonical=canonical)
+
+    def test_codes_longer_than_one_table(self):
+        for flat_tree in (False, True):
+            with self.subTest(flat_tree=flat_tree):
+                encoder = self.check_round_trip(fibonacci_text(20), flat_tree=flat_tree)
+                self.assertGreater(encoder.decode_table.max_length, 2 * DEFAULT_LOOKUP_BITS - 2)
+
+    def test_length_limited(self):
+        for flat_tree in (False, True):
+            with self.subTest(flat_tree=flat_tree):
+                encoder = self.check_round_trip(fibonacci_text(20), flat_tree=flat_tree, max_code_length=12,
+                                                canonical=True)
+                self.assertEqual(encoder.decode_table.max_length, 12)
+
+    def test_trees_agree(self):
+        for name, text in sample_texts():
+            with self.subTest(name):
+                plain = HuffmanEncoder(text)
+                plain.do_setup()
+                flat = HuffmanEncoder(text, flat_tree=True)
+                flat.do_setup()
+                self.assertEqual(flat.encode_message(text), plain.encode_message(text))
+
+    def test_from_header(self):
+        for name, text in sample_texts():
+            with self.subTest(name):
+                encoder = HuffmanEncoder(text, canonical=True)
+                encoder.do_setup()
+                decoder = HuffmanEncoder.from_header(encoder.get_header())
+                packed, bit_length = encoder.encode_message_packed(text)
+                self.assertEqual(decoder.decode_message_packed(packed, bit_length), text)
+                with self.assertRaises(ValueError):
+                    decoder.decode_message_with_tree(encoder.encode_message(text))
+
+    def test_bad_code_lengths(self):
+        for lengths in ({"a": 1, "b": 1, "c": 1}, {"a": 0, "b": 1, "c": 1}, {"a": 1, "b": 2}, {"a": 1}):
+            with self.subTest(lengths=lengths):
+                with self.assertRaises(ValueError):
+                    HuffmanEncoder.from_header(serialize_code_lengths(lengths))
+
+
+if __name__ == "__main__":
+    unittest.main()